@@ -63,7 +63,7 @@ def start_web_server():
     
     try:
         logger.info("Запуск веб-сервера Flask...")
-        cmd = ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "main:app"]
+        cmd = ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "--threads", "8", "main:app"]
         logger.info(f"Команда: {' '.join(cmd)}")
         
         web_process = subprocess.Popen(
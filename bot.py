@@ -5,7 +5,8 @@ import sys
 from datetime import datetime, time, timedelta
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton, 
     InlineKeyboardMarkup, InlineKeyboardButton, 
@@ -16,11 +17,19 @@ from aiogram.types import (
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
-from utils import get_latest_news, format_news_message, get_categorized_news
+import http_client
+from utils import get_latest_news_async, format_news_message, get_categorized_news, split_message, digest_content_hash, news_link_hashes, news_deduplicator
+from news_cache import NewsCache
+from broadcast import Broadcaster
+from media_cache import media_cache
+from send_scheduler import SendScheduler
+from db_executor import run_db
+from settings_cache import SettingsCache
 
 # Initialize Flask app context to access models
 try:
-    from main import app, db, Subscriber, FeedSource, BotSettings, NewsItem, SendTime
+    from main import app, db, Subscriber, FeedSource, BotSettings, NewsItem, SendTime, upsert_news_items, search_news
+    import outbox
     use_db = True
     
     # Function to get bot settings
@@ -34,80 +43,75 @@ try:
                 db.session.commit()
             return settings
     
-    # Function to check if bot is active
-    def is_bot_active():
-        """Check if bot is active based on settings"""
+    # Function to load settings for the settings cache
+    def load_settings():
+        """Load bot settings and active send times from the database in one app context"""
         with app.app_context():
             settings = BotSettings.query.first()
-            if not settings:
-                return True  # Default to active if no settings
-            return settings.is_active
+            send_times = [st.send_time for st in SendTime.query.filter_by(is_active=True).order_by(SendTime.send_time).all()]
+            admin_ids = frozenset(row.user_id for row in db.session.query(Subscriber.user_id).filter_by(is_admin=True))
+            return {
+                'version': (settings.settings_version or 0) if settings else 0,
+                'is_active': settings.is_active if settings else True,  # Default to active if no settings
+                'news_per_source': settings.news_per_source if settings else config.NEWS_PER_FEED,
+                'telegram_token': settings.telegram_token if settings and settings.telegram_token else config.API_TOKEN,
+                'daily_send_time': settings.daily_send_time if settings and settings.daily_send_time else time(8, 0),
+                'send_times': send_times,
+                'admin_ids': admin_ids
+            }
+    
+    def load_settings_version():
+        """Load only the settings version counter"""
+        with app.app_context():
+            version = db.session.query(BotSettings.settings_version).limit(1).scalar()
+            return version or 0
+    
+    settings_cache = SettingsCache(
+        load_settings,
+        load_settings_version,
+        defaults={
+            'version': None,
+            'is_active': True,
+            'news_per_source': config.NEWS_PER_FEED,
+            'telegram_token': config.API_TOKEN,
+            'daily_send_time': time(8, 0),
+            'send_times': [],
+            'admin_ids': None  # None - используется запасной список администраторов
+        },
+        ttl=config.SETTINGS_CACHE_TTL
+    )
+    
+    # Function to check if bot is active
+    def is_bot_active():
+        """Check if bot is active based on settings (cached)"""
+        return settings_cache.get()['is_active']
     
     # Function to get Telegram token
     def get_telegram_token():
-        """Get Telegram token from database settings"""
-        with app.app_context():
-            settings = BotSettings.query.first()
-            if settings and settings.telegram_token:
-                return settings.telegram_token
-            return config.API_TOKEN
+        """Get Telegram token from database settings (cached)"""
+        return settings_cache.get()['telegram_token']
     
     # Function to get news per source
     def get_news_per_source():
-        """Get news per source setting"""
-        with app.app_context():
-            settings = BotSettings.query.first()
-            if settings:
-                return settings.news_per_source
-            return config.NEWS_PER_FEED
+        """Get news per source setting (cached)"""
+        return settings_cache.get()['news_per_source']
     
     # Function to get daily send time
     def get_daily_send_time():
-        """Get daily send time setting (Moscow time)"""
-        with app.app_context():
-            settings = BotSettings.query.first()
-            if settings and settings.daily_send_time:
-                return settings.daily_send_time
-            return time(8, 0)  # Default to 8:00 AM Moscow time
+        """Get daily send time setting (Moscow time, cached)"""
+        return settings_cache.get()['daily_send_time']
             
     # Function to get all active send times
     def get_all_send_times():
-        """Get all active send times from the database (all times in Moscow timezone)"""
-        with app.app_context():
-            # Фиксированные времена рассылки по умолчанию: 8:00, 12:00, 18:00
-            hardcoded_times = [time(8, 0), time(12, 0), time(18, 0)]
-            
-            try:
-                # Get main send time from settings
-                settings = BotSettings.query.first()
-                main_time = time(8, 0)  # Default - 8:00 AM Moscow time
-                if settings and settings.daily_send_time:
-                    main_time = settings.daily_send_time
-                    
-                # Get additional send times
-                additional_times = [st.send_time for st in SendTime.query.filter_by(is_active=True).all()]
-                
-                # Combine all times
-                all_times = [main_time] + additional_times
-                
-                # Проверяем, получили ли мы хотя бы одно время
-                if not all_times:
-                    logger.warning("No send times found in database, using hardcoded times")
-                    all_times = hardcoded_times
-            except Exception as e:
-                logger.error(f"Error getting send times from database: {e}")
-                # В случае ошибки используем фиксированные времена
-                all_times = hardcoded_times
-            
-            # Log all times for debugging
-            time_strings = [t.strftime('%H:%M') for t in all_times]
-            logger.info(f"Scheduled send times (Moscow): {', '.join(time_strings)}")
+        """Get all active send times (all times in Moscow timezone, cached)"""
+        settings = settings_cache.get()
+        all_times = [settings['daily_send_time']] + settings['send_times']
+        
+        # Log all times for debugging
+        time_strings = [t.strftime('%H:%M') for t in all_times]
+        logger.info(f"Scheduled send times (Moscow): {', '.join(time_strings)}")
             
-            # Hard debug check: вывести все времена подробно
-            for idx, t in enumerate(all_times):
-                logger.info(f"Send time {idx+1}: {t.strftime('%H:%M')} - hour={t.hour}, minute={t.minute}")
-                
-            return all_times
+        return all_times
     
     # Function to add subscriber using Flask models
     def add_subscriber(user_id, username=None, first_name=None, last_name=None):
@@ -154,37 +158,25 @@ try:
     def get_all_subscribers():
         """Get all active subscribers using Flask SQLAlchemy model"""
         with app.app_context():
-            subscribers = Subscriber.query.filter_by(is_active=True).all()
-            return [s.user_id for s in subscribers]
+            rows = db.session.query(Subscriber.user_id).filter_by(is_active=True).all()
+            return [row.user_id for row in rows]
     
     # Function to save news items to database
     def save_news_items(news_items):
         """Save news items to database"""
         with app.app_context():
-            # Clear existing news
-            NewsItem.query.delete()
-            
-            # Save new items
-            for item in news_items:
-                # Find the feed source
-                feed_source = FeedSource.query.filter_by(name=item.get('source', '')).first()
-                feed_id = feed_source.id if feed_source else None
-                
-                news_item = NewsItem(
-                    title=item['title'],
-                    link=item['link'],
-                    source=item.get('source', ''),
-                    summary=item.get('summary', ''),
-                    pub_date=item.get('pub_date', ''),
-                    feed_id=feed_id
-                )
-                db.session.add(news_item)
-            
-            db.session.commit()
+            upsert_news_items(news_items)
+    
+    # Function to search stored news
+    def search_news_items(query, limit):
+        """Full-text search over stored news, most relevant first"""
+        with app.app_context():
+            return [item.to_dict() for item in search_news(query, limit)]
 
 except ImportError:
     # If Flask app is not available, use the simple JSON db
     use_db = False
+    settings_cache = None
     from db import add_subscriber, remove_subscriber, get_all_subscribers
     
     def get_bot_settings():
@@ -209,6 +201,9 @@ except ImportError:
     def save_news_items(news_items):
         pass  # No database to save to
     
+    def search_news_items(query, limit):
+        return []  # Без базы данных новости не сохраняются
+    
     logging.warning("Could not import Flask models, using JSON database instead")
 
 # Configure logging
@@ -220,7 +215,7 @@ logger = logging.getLogger(__name__)
 
 # Проверка является ли пользователь администратором
 async def is_admin(user_id: int) -> bool:
-    """Проверяет, является ли пользователь администратором"""
+    """Проверяет, является ли пользователь администратором (по кэшу, без запроса к БД)"""
     # Предопределенный список администраторов для аварийного режима
     admin_ids = [502783765, 957555131, 1148332858]
     
@@ -228,14 +223,11 @@ async def is_admin(user_id: int) -> bool:
     if not use_db:
         return user_id in admin_ids
     
-    try:
-        with app.app_context():
-            subscriber = Subscriber.query.filter_by(user_id=user_id, is_admin=True).first()
-            return subscriber is not None
-    except Exception as e:
-        logger.error(f"Ошибка при проверке статуса администратора: {e}")
-        # Если произошла ошибка, используем запасной список
+    cached_admin_ids = settings_cache.get()['admin_ids']
+    if cached_admin_ids is None:
+        # Настройки еще не удалось загрузить из БД, используем запасной список
         return user_id in admin_ids
+    return user_id in cached_admin_ids
 
 # Create keyboards for bot
 def get_main_keyboard():
@@ -302,9 +294,28 @@ def get_admin_keyboard():
 #     
 #     return builder.as_markup()
 
+async def load_news(news_per_source: int):
+    """Fetch fresh news and store them in the database (used by the news cache)"""
+    news_items, has_errors = await get_latest_news_async(news_per_source)
+    
+    # Save news items to database if using DB
+    if use_db:
+        await run_db(save_news_items, news_items)
+    
+    # В архив попадают все копии, а в сообщения - одна новость на историю со списком also_in
+    return news_deduplicator.deduplicate(news_items), has_errors
+
+# Shared news cache: concurrent requests wait for one refresh
+news_cache = NewsCache(load_news, ttl=config.NEWS_CACHE_TTL)
+
+if settings_cache is not None:
+    # Снимок настроек загружаем при запуске, пока event loop еще не работает:
+    # дальше обработчики читают только кэш, а обновляет его settings_cache.watch()
+    settings_cache.reload()
+
 # Initialize bot and dispatcher with token from settings
 token = get_telegram_token()
-bot = Bot(token=token)
+bot = Bot(token=token, session=http_client.create_bot_session())
 dp = Dispatcher()
 
 # Регистрация команд бота
@@ -313,6 +324,7 @@ async def set_bot_commands():
     await bot.set_my_commands([
         BotCommand(command="start", description="Старт - начать работу с ботом"),
         BotCommand(command="news", description="Запрос новостей - получить свежие новости"),
+        BotCommand(command="search", description="Поиск - найти новости в архиве"),
         BotCommand(command="subscribe", description="Начало подписки - подписаться на рассылку"),
         BotCommand(command="unsubscribe", description="Отмена подписки - отписаться от рассылки"),
         BotCommand(command="settings", description="Настройки - посмотреть настройки"),
@@ -380,12 +392,8 @@ async def cmd_news(message: types.Message):
     # Get news per source setting
     news_per_source = get_news_per_source()
     
-    # Fetch news
-    news_items, has_errors = get_latest_news(news_per_source)
-    
-    # Save news items to database if using DB
-    if use_db:
-        save_news_items(news_items)
+    # Fetch news (served from cache if it was refreshed recently)
+    news_items, has_errors = await news_cache.get(news_per_source)
     
     if not news_items:
         await message.reply(
@@ -413,19 +421,21 @@ async def cmd_news(message: types.Message):
         # Ограничиваем количество изображений
         images_to_send = news_with_images[:3]
         
-        media_group = []
-        for item in images_to_send:
-            if item.get('image_url'):
-                caption = f"<b>{item['title']}</b>\n\n🔗 <a href='{item['link']}'>Читать полностью</a>"
-                media_group.append(InputMediaPhoto(
-                    media=item['image_url'],
-                    caption=caption,
-                    parse_mode="HTML"
-                ))
+        media_items = [
+            {
+                'image_url': item['image_url'],
+                'caption': f"<b>{item['title']}</b>\n\n🔗 <a href='{item['link']}'>Читать полностью</a>"
+            }
+            for item in images_to_send if item.get('image_url')
+        ]
         
-        if media_group:
+        if media_items:
             try:
-                await message.answer_media_group(media=media_group)
+                await media_cache.load(media['image_url'] for media in media_items)
+                await send_media_group_cached(
+                    lambda group: message.answer_media_group(media=group),
+                    media_items
+                )
             except Exception as e:
                 logger.error(f"Error sending media group: {e}")
                 # Fallback: отправляем сообщение о проблеме с изображениями
@@ -600,6 +610,60 @@ async def cmd_news(message: types.Message):
 #         reply_markup=builder.as_markup()
 #     )
 
+@dp.message(Command('поиск', 'search'))
+async def cmd_search(message: types.Message, command: CommandObject):
+    """Handle /поиск command: full-text search over stored news"""
+    if not is_bot_active():
+        await message.reply(
+            "⚠️ Бот временно отключен администратором. Пожалуйста, попробуйте позже.",
+            parse_mode="HTML"
+        )
+        return
+    
+    query = (command.args or '').strip()
+    if not query:
+        await message.reply(
+            "🔎 Укажите слова для поиска, например: <code>/поиск пляж</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    try:
+        news_items = await run_db(search_news_items, query, config.SEARCH_RESULTS_LIMIT)
+    except Exception as e:
+        logger.error(f"Error searching news: {e}")
+        await message.reply(
+            "❌ Не удалось выполнить поиск. Попробуйте позже.",
+            parse_mode="HTML"
+        )
+        return
+    
+    safe_query = query.replace('<', '&lt;').replace('>', '&gt;')
+    if not news_items:
+        await message.reply(
+            f"🔎 По запросу «{safe_query}» ничего не найдено.",
+            parse_mode="HTML"
+        )
+        return
+    
+    parts = [f"🔎 <b>Результаты по запросу «{safe_query}»</b> ({len(news_items)})"]
+    for item in news_items:
+        title = item['title'].replace('<', '&lt;').replace('>', '&gt;')
+        source = f"{item['source']}, " if item.get('source') else ""
+        pub_date = item.get('pub_date') or (item.get('created_at') or '')[:10]
+        parts.append(
+            f"📰 <b>{title}</b>\n"
+            f"<i>{source}{pub_date}</i>\n"
+            f"🔗 <a href='{item['link']}'>Читать полностью</a>"
+        )
+    
+    for chunk in split_message("\n\n".join(parts)):
+        await message.reply(
+            chunk,
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+
 @dp.message(Command('подписаться', 'subscribe'))
 @dp.message(F.text == "✅ Подписаться")
 async def cmd_subscribe(message: types.Message):
@@ -620,7 +684,7 @@ async def cmd_subscribe(message: types.Message):
     is_user_admin = await is_admin(message.from_user.id)
     keyboard = get_admin_keyboard() if is_user_admin else get_main_keyboard()
     
-    if add_subscriber(user_id, username, first_name, last_name):
+    if await run_db(add_subscriber, user_id, username, first_name, last_name):
         # Get daily send time
         send_time = get_daily_send_time()
         time_str = send_time.strftime("%H:%M")
@@ -655,7 +719,7 @@ async def cmd_unsubscribe(message: types.Message):
     is_user_admin = await is_admin(message.from_user.id)
     keyboard = get_admin_keyboard() if is_user_admin else get_main_keyboard()
     
-    if remove_subscriber(user_id):
+    if await run_db(remove_subscriber, user_id):
         await message.reply(
             "✅ Вы успешно отписались от рассылки новостей.",
             parse_mode="HTML",
@@ -687,6 +751,7 @@ async def cmd_help(message: types.Message):
         "📋 <b>Доступные команды:</b>\n"
         "/start - Начать работу с ботом\n"
         "/новости - Получить свежие новости\n"
+        "/поиск &lt;слова&gt; - Найти новости в архиве\n"
         "/подписаться - Подписаться на ежедневную рассылку\n"
         "/отписаться - Отписаться от рассылки\n"
         "/настройки - Настройки уведомлений\n"
@@ -714,6 +779,65 @@ async def cmd_help(message: types.Message):
 
 
 
+def build_info_text(is_user_admin):
+    """Собрать текст /информация (синхронно, выполняется в пуле БД)"""
+    with app.app_context():
+        # Статус бота
+        settings = BotSettings.query.first()
+        status = "Активен ✅" if (settings and settings.is_active) else "Неактивен ❌"
+        
+        # Источники новостей
+        feed_sources = FeedSource.query.filter_by(is_active=True).all()
+        feeds_list = "\n".join([f"• {feed.name}" for feed in feed_sources]) if feed_sources else "Нет активных источников"
+        
+        # Подписчики
+        active_subscribers = Subscriber.query.filter_by(is_active=True).count()
+        total_subscribers = Subscriber.query.count()
+        
+        # Время рассылки
+        main_time = settings.daily_send_time.strftime('%H:%M') if settings and settings.daily_send_time else "08:00"
+        additional_times = SendTime.query.filter_by(is_active=True).all()
+        times_list = [main_time]
+        times_list.extend([time.send_time.strftime('%H:%M') for time in additional_times])
+        times_formatted = ", ".join(times_list)
+        
+        # Новости
+        news_count = NewsItem.query.count()
+        latest_news = NewsItem.query.order_by(NewsItem.created_at.desc()).first()
+        latest_update = latest_news.created_at.strftime('%Y-%m-%d %H:%M') if latest_news else "Нет данных"
+        
+        # Получаем текущее московское время
+        moscow_now = get_moscow_time()
+        moscow_time_str = moscow_now.strftime('%H:%M:%S %d.%m.%Y')
+        
+        # Собираем текст сообщения
+        info_text = (
+            "<b>📊 Информация о боте</b>\n\n"
+            f"<b>Статус:</b> {status}\n"
+            f"<b>Подписчиков:</b> {active_subscribers} активных из {total_subscribers} всего\n"
+            f"<b>Количество новостей в базе:</b> {news_count}\n"
+            f"<b>Последнее обновление:</b> {latest_update}\n"
+            f"<b>Рассылка в:</b> {times_formatted} <i>(московское время)</i>\n"
+            f"<b>Текущее московское время:</b> {moscow_time_str}\n\n"
+            "<b>📰 Источники новостей:</b>\n"
+            f"{feeds_list}\n\n"
+        )
+        
+        # Добавляем админскую информацию если пользователь админ
+        if is_user_admin:
+            admins = Subscriber.query.filter_by(is_admin=True).all()
+            admins_list = "\n".join([f"• {admin.first_name or ''} {admin.last_name or ''} (@{admin.username or 'нет username'}) - ID: {admin.user_id}" 
+                                    for admin in admins]) if admins else "Нет администраторов"
+        
+            info_text += (
+                "<b>👑 Администраторы бота:</b>\n"
+                f"{admins_list}\n\n"
+            )
+        
+        info_text += "Для управления подпиской используйте соответствующие команды в меню."
+        
+        return info_text
+
 @dp.message(Command('информация', 'info'))
 @dp.message(F.text == "ℹ️ Информация")
 async def cmd_info(message: types.Message):
@@ -731,61 +855,7 @@ async def cmd_info(message: types.Message):
     
     # Получаем информацию о боте
     try:
-        with app.app_context():
-            # Статус бота
-            settings = BotSettings.query.first()
-            status = "Активен ✅" if (settings and settings.is_active) else "Неактивен ❌"
-            
-            # Источники новостей
-            feed_sources = FeedSource.query.filter_by(is_active=True).all()
-            feeds_list = "\n".join([f"• {feed.name}" for feed in feed_sources]) if feed_sources else "Нет активных источников"
-            
-            # Подписчики
-            active_subscribers = Subscriber.query.filter_by(is_active=True).count()
-            total_subscribers = Subscriber.query.count()
-            
-            # Время рассылки
-            main_time = settings.daily_send_time.strftime('%H:%M') if settings and settings.daily_send_time else "08:00"
-            additional_times = SendTime.query.filter_by(is_active=True).all()
-            times_list = [main_time]
-            times_list.extend([time.send_time.strftime('%H:%M') for time in additional_times])
-            times_formatted = ", ".join(times_list)
-            
-            # Новости
-            news_count = NewsItem.query.count()
-            latest_news = NewsItem.query.order_by(NewsItem.created_at.desc()).first()
-            latest_update = latest_news.created_at.strftime('%Y-%m-%d %H:%M') if latest_news else "Нет данных"
-            
-            # Получаем текущее московское время
-            moscow_now = get_moscow_time()
-            moscow_time_str = moscow_now.strftime('%H:%M:%S %d.%m.%Y')
-            
-            # Собираем текст сообщения
-            info_text = (
-                "<b>📊 Информация о боте</b>\n\n"
-                f"<b>Статус:</b> {status}\n"
-                f"<b>Подписчиков:</b> {active_subscribers} активных из {total_subscribers} всего\n"
-                f"<b>Количество новостей в базе:</b> {news_count}\n"
-                f"<b>Последнее обновление:</b> {latest_update}\n"
-                f"<b>Рассылка в:</b> {times_formatted} <i>(московское время)</i>\n"
-                f"<b>Текущее московское время:</b> {moscow_time_str}\n\n"
-                "<b>📰 Источники новостей:</b>\n"
-                f"{feeds_list}\n\n"
-            )
-            
-            # Добавляем админскую информацию если пользователь админ
-            if is_user_admin:
-                admins = Subscriber.query.filter_by(is_admin=True).all()
-                admins_list = "\n".join([f"• {admin.first_name or ''} {admin.last_name or ''} (@{admin.username or 'нет username'}) - ID: {admin.user_id}" 
-                                        for admin in admins]) if admins else "Нет администраторов"
-                
-                info_text += (
-                    "<b>👑 Администраторы бота:</b>\n"
-                    f"{admins_list}\n\n"
-                )
-            
-            info_text += "Для управления подпиской используйте соответствующие команды в меню."
-                
+        info_text = await run_db(build_info_text, is_user_admin)
     except Exception as e:
         logger.error(f"Error getting bot info: {e}")
         info_text = "⚠️ Не удалось получить информацию о боте. Пожалуйста, попробуйте позже."
@@ -796,6 +866,53 @@ async def cmd_info(message: types.Message):
         reply_markup=keyboard
     )
 
+def build_settings_text(user_id, is_user_admin):
+    """Собрать текст /настройки (синхронно, выполняется в пуле БД)"""
+    with app.app_context():
+        subscriber = Subscriber.query.filter_by(user_id=user_id).first()
+        is_subscribed = subscriber and subscriber.is_active
+        
+        # Основное время рассылки
+        settings = BotSettings.query.first()
+        main_time = settings.daily_send_time.strftime('%H:%M') if settings and settings.daily_send_time else "08:00"
+        
+        # Дополнительные времена
+        additional_times = SendTime.query.filter_by(is_active=True).all()
+        if additional_times:
+            times_list = [time.send_time.strftime('%H:%M') for time in additional_times]
+            times_text = ", ".join(times_list)
+        else:
+            times_text = "Не настроены"
+        
+        # Получаем текущее московское время
+        moscow_now = get_moscow_time()
+        moscow_time_str = moscow_now.strftime('%H:%M:%S %d.%m.%Y')
+        
+        # Формируем текст настроек
+        settings_text = (
+            "<b>⚙️ Настройки</b>\n\n"
+            f"<b>Статус подписки:</b> {'Активна ✅' if is_subscribed else 'Неактивна ❌'}\n"
+            f"<b>Основное время рассылки:</b> {main_time} <i>(московское время)</i>\n"
+            f"<b>Дополнительные рассылки:</b> {times_text} <i>(московское время)</i>\n"
+            f"<b>Текущее московское время:</b> {moscow_time_str}\n\n"
+        )
+        
+        if is_user_admin:
+            settings_text += (
+                "<b>👑 Права администратора:</b> Есть\n\n"
+                "Используйте веб-интерфейс администратора для настройки бота:\n"
+                "• Управление источниками\n"
+                "• Управление временем рассылки\n"
+                "• Настройка токена и параметров бота"
+            )
+        else:
+            settings_text += (
+                "Для управления подпиской используйте команды /подписаться и /отписаться.\n\n"
+                "Вы будете получать новости по расписанию, настроенному администратором бота."
+            )
+        
+        return settings_text
+
 @dp.message(Command('настройки', 'settings'))
 @dp.message(F.text == "⚙️ Настройки")
 async def cmd_settings(message: types.Message):
@@ -814,49 +931,7 @@ async def cmd_settings(message: types.Message):
     # Получаем информацию о подписке пользователя
     user_id = message.from_user.id
     try:
-        with app.app_context():
-            subscriber = Subscriber.query.filter_by(user_id=user_id).first()
-            is_subscribed = subscriber and subscriber.is_active
-            
-            # Основное время рассылки
-            settings = BotSettings.query.first()
-            main_time = settings.daily_send_time.strftime('%H:%M') if settings and settings.daily_send_time else "08:00"
-            
-            # Дополнительные времена
-            additional_times = SendTime.query.filter_by(is_active=True).all()
-            if additional_times:
-                times_list = [time.send_time.strftime('%H:%M') for time in additional_times]
-                times_text = ", ".join(times_list)
-            else:
-                times_text = "Не настроены"
-            
-            # Получаем текущее московское время
-            moscow_now = get_moscow_time()
-            moscow_time_str = moscow_now.strftime('%H:%M:%S %d.%m.%Y')
-            
-            # Формируем текст настроек
-            settings_text = (
-                "<b>⚙️ Настройки</b>\n\n"
-                f"<b>Статус подписки:</b> {'Активна ✅' if is_subscribed else 'Неактивна ❌'}\n"
-                f"<b>Основное время рассылки:</b> {main_time} <i>(московское время)</i>\n"
-                f"<b>Дополнительные рассылки:</b> {times_text} <i>(московское время)</i>\n"
-                f"<b>Текущее московское время:</b> {moscow_time_str}\n\n"
-            )
-            
-            if is_user_admin:
-                settings_text += (
-                    "<b>👑 Права администратора:</b> Есть\n\n"
-                    "Используйте веб-интерфейс администратора для настройки бота:\n"
-                    "• Управление источниками\n"
-                    "• Управление временем рассылки\n"
-                    "• Настройка токена и параметров бота"
-                )
-            else:
-                settings_text += (
-                    "Для управления подпиской используйте команды /подписаться и /отписаться.\n\n"
-                    "Вы будете получать новости по расписанию, настроенному администратором бота."
-                )
-    
+        settings_text = await run_db(build_settings_text, user_id, is_user_admin)
     except Exception as e:
         logger.error(f"Error getting settings: {e}")
         settings_text = "⚠️ Не удалось получить настройки. Пожалуйста, попробуйте позже."
@@ -867,6 +942,44 @@ async def cmd_settings(message: types.Message):
         reply_markup=keyboard
     )
 
+def build_stats_text():
+    """Собрать текст /статистика (синхронно, выполняется в пуле БД)"""
+    with app.app_context():
+        # Подписчики
+        total_subscribers = Subscriber.query.count()
+        active_subscribers = Subscriber.query.filter_by(is_active=True).count()
+        inactive_subscribers = total_subscribers - active_subscribers
+        admins_count = Subscriber.query.filter_by(is_admin=True).count()
+        
+        # Источники новостей
+        total_feeds = FeedSource.query.count()
+        active_feeds = FeedSource.query.filter_by(is_active=True).count()
+        inactive_feeds = total_feeds - active_feeds
+        
+        # Новости
+        news_count = NewsItem.query.count()
+        
+        # Статистика по дням
+        # Тут можно добавить более детальную статистику в будущем
+        
+        stats_text = (
+            "<b>📊 Статистика бота</b>\n\n"
+            f"<b>Подписчики:</b>\n"
+            f"• Всего: {total_subscribers}\n"
+            f"• Активных: {active_subscribers}\n"
+            f"• Неактивных: {inactive_subscribers}\n"
+            f"• Администраторов: {admins_count}\n\n"
+            f"<b>Источники новостей:</b>\n"
+            f"• Всего: {total_feeds}\n"
+            f"• Активных: {active_feeds}\n"
+            f"• Неактивных: {inactive_feeds}\n\n"
+            f"<b>Новости:</b>\n"
+            f"• Всего записей: {news_count}\n\n"
+            "Используйте веб-интерфейс для просмотра подробной статистики и управления ботом."
+        )
+        
+        return stats_text
+
 @dp.message(Command('статистика', 'stats'))
 @dp.message(F.text == "📊 Статистика")
 async def cmd_stats(message: types.Message):
@@ -890,40 +1003,7 @@ async def cmd_stats(message: types.Message):
     
     # Собираем статистику
     try:
-        with app.app_context():
-            # Подписчики
-            total_subscribers = Subscriber.query.count()
-            active_subscribers = Subscriber.query.filter_by(is_active=True).count()
-            inactive_subscribers = total_subscribers - active_subscribers
-            admins_count = Subscriber.query.filter_by(is_admin=True).count()
-            
-            # Источники новостей
-            total_feeds = FeedSource.query.count()
-            active_feeds = FeedSource.query.filter_by(is_active=True).count()
-            inactive_feeds = total_feeds - active_feeds
-            
-            # Новости
-            news_count = NewsItem.query.count()
-            
-            # Статистика по дням
-            # Тут можно добавить более детальную статистику в будущем
-            
-            stats_text = (
-                "<b>📊 Статистика бота</b>\n\n"
-                f"<b>Подписчики:</b>\n"
-                f"• Всего: {total_subscribers}\n"
-                f"• Активных: {active_subscribers}\n"
-                f"• Неактивных: {inactive_subscribers}\n"
-                f"• Администраторов: {admins_count}\n\n"
-                f"<b>Источники новостей:</b>\n"
-                f"• Всего: {total_feeds}\n"
-                f"• Активных: {active_feeds}\n"
-                f"• Неактивных: {inactive_feeds}\n\n"
-                f"<b>Новости:</b>\n"
-                f"• Всего записей: {news_count}\n\n"
-                "Используйте веб-интерфейс для просмотра подробной статистики и управления ботом."
-            )
-    
+        stats_text = await run_db(build_stats_text)
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         stats_text = "⚠️ Не удалось получить статистику. Пожалуйста, попробуйте позже."
@@ -964,12 +1044,8 @@ async def cmd_refresh(message: types.Message):
         # Получаем лимит новостей из настроек
         news_per_source = get_news_per_source()
         
-        # Получаем новости
-        news_items, has_errors = get_latest_news(news_per_source)
-        
-        # Сохраняем в базу данных
-        if use_db:
-            save_news_items(news_items)
+        # Получаем новости в обход кэша и сохраняем в базу данных
+        news_items, has_errors = await news_cache.get(news_per_source, force=True)
         
         # Формируем ответ
         if news_items:
@@ -1005,7 +1081,272 @@ async def unknown_message(message: types.Message):
         reply_markup=keyboard
     )
 
-async def send_news_to_subscribers():
+def build_media_group(media_items):
+    """Build InputMediaPhoto objects, using cached Telegram file_ids where available"""
+    return [
+        InputMediaPhoto(media=media_cache.media_for(media['image_url']), caption=media['caption'], parse_mode="HTML")
+        for media in media_items
+    ]
+
+async def send_media_group_cached(send, media_items):
+    """
+    Send a media group and remember the file_ids Telegram returns
+    
+    Args:
+        send: Coroutine factory taking the media group list
+        media_items: List of {'image_url': ..., 'caption': ...}
+    """
+    urls = [media['image_url'] for media in media_items]
+    uploaded = any(media_cache.get(url) is None for url in urls)
+    try:
+        messages = await send(build_media_group(media_items))
+    except TelegramBadRequest:
+        # Telegram мог перестать принимать сохраненные file_id
+        if not uploaded:
+            await media_cache.forget(urls)
+        raise
+    if uploaded:
+        await media_cache.remember(urls, messages)
+    return messages
+
+async def broadcast_payload(broadcaster, payload, user_ids, on_result=None):
+    """Send a digest payload to the given users through the broadcast engine"""
+    # Дайджесты, созданные до разбиения на части, хранят один текст; пустые части не отправляем
+    chunks = [chunk for chunk in payload.get('chunks') or [payload.get('text') or ''] if chunk.strip()]
+    media_items = payload.get('media', [])
+    if not chunks:
+        logger.warning("Digest has no text to send, only its media will be delivered")
+    await media_cache.load(media['image_url'] for media in media_items)
+    media_group = build_media_group(media_items)
+    urls = [media['image_url'] for media in media_items]
+    
+    # Изображения загружает только первый получатель, остальные ждут его file_id
+    upload_lock = asyncio.Lock()
+    upload_state = {'done': all(media_cache.get(url) for url in urls)}
+    
+    async def upload_media(user_id):
+        """Upload the images while sending to this user; False if someone else already did"""
+        nonlocal media_group
+        async with upload_lock:
+            if upload_state['done']:
+                return False
+            try:
+                await broadcaster.call(
+                    user_id,
+                    lambda: send_media_group_cached(
+                        lambda group: bot.send_media_group(user_id, media=group),
+                        media_items
+                    ),
+                    cost=len(media_items)
+                )
+                # При ошибке флаг не ставим: загрузку повторит следующий получатель
+                upload_state['done'] = True
+            finally:
+                media_group = build_media_group(media_items)
+            return True
+    
+    async def send_cached_media(user_id):
+        nonlocal media_group
+        group = media_group
+        try:
+            await broadcaster.call(
+                user_id,
+                lambda: bot.send_media_group(user_id, media=group),
+                cost=len(media_items)
+            )
+        except TelegramBadRequest:
+            # Сохраненные file_id устарели (например, сменился токен бота) - загружаем изображения заново
+            async with upload_lock:
+                if media_group is group:
+                    logger.warning("Cached media file_ids were rejected, uploading images again")
+                    await media_cache.forget(urls)
+                    upload_state['done'] = False
+                    media_group = build_media_group(media_items)
+            if not await upload_media(user_id):
+                await broadcaster.call(
+                    user_id,
+                    lambda: bot.send_media_group(user_id, media=media_group),
+                    cost=len(media_items)
+                )
+    
+    async def deliver(user_id):
+        # Отправляем основной текст новостей
+        for chunk in chunks:
+            await broadcaster.call(user_id, lambda: bot.send_message(
+                user_id,
+                chunk,
+                parse_mode="HTML",
+                disable_web_page_preview=True
+            ))
+        
+        # Отправляем медиа-группу, если есть изображения
+        if not media_items:
+            return
+        try:
+            if upload_state['done'] or not await upload_media(user_id):
+                await send_cached_media(user_id)
+        except TelegramForbiddenError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending media to user {user_id}: {e}")
+    
+    return await broadcaster.run(user_ids, deliver, on_result)
+
+async def deliver_digest(digest_id, payload):
+    """Drain the outbox of a digest batch by batch, recording every delivery"""
+    broadcaster = Broadcaster()
+    totals = {'sent': 0, 'blocked': 0, 'failed': 0}
+    
+    while True:
+        user_ids = await run_db(outbox.get_pending_recipients, digest_id, config.OUTBOX_BATCH_SIZE)
+        if not user_ids:
+            # Неудачные доставки повторяем, пока у них остаются попытки
+            if not await run_db(outbox.retry_failed, digest_id, config.OUTBOX_MAX_ATTEMPTS):
+                break
+            await asyncio.sleep(config.OUTBOX_RETRY_DELAY)
+            continue
+        
+        stats = await deliver_digest_batch(broadcaster, digest_id, payload, user_ids)
+        for key in totals:
+            totals[key] += stats[key]
+    
+    await run_db(outbox.finish_digest, digest_id)
+    logger.info(f"Digest {digest_id} delivered: {totals['sent']} sent, {totals['blocked']} blocked, {totals['failed']} failed")
+
+async def deliver_digest_batch(broadcaster, digest_id, payload, user_ids):
+    """
+    Send one outbox batch, saving delivery statuses while it is being sent
+    
+    Statuses are flushed every OUTBOX_FLUSH_INTERVAL seconds, so a restart
+    re-sends the digest only to the few subscribers whose status was not saved yet.
+    """
+    results = {}
+    def on_result(user_id, status, error):
+        results[user_id] = {'status': status, 'error': error}
+    
+    async def flush():
+        if results:
+            batch = dict(results)
+            results.clear()
+            await run_db(outbox.save_results, digest_id, batch)
+    
+    task = asyncio.create_task(broadcast_payload(broadcaster, payload, user_ids, on_result))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=config.OUTBOX_FLUSH_INTERVAL)
+            await flush()
+    except BaseException:
+        task.cancel()
+        raise
+    return task.result()
+
+def is_digest_slot_expired(slot_key):
+    """Check whether the send time of a digest slot is older than the scheduler grace window"""
+    try:
+        slot_time = datetime.strptime(slot_key, '%Y-%m-%d_%H:%M')
+    except (TypeError, ValueError):
+        return False
+    now = get_moscow_time().replace(tzinfo=None)
+    return slot_time + timedelta(minutes=config.SCHEDULER_GRACE_MINUTES) < now
+
+async def resume_unfinished_digests():
+    """Continue digests that were interrupted by a restart, closing out stale ones"""
+    if not use_db:
+        return
+    
+    try:
+        digests = await run_db(outbox.get_unfinished_digests)
+        for digest in digests:
+            if is_digest_slot_expired(digest['slot_key']):
+                expired = await run_db(outbox.expire_digest, digest['id'])
+                logger.warning(f"Digest {digest['slot_key']} is too old to resume: {expired} undelivered messages expired")
+                continue
+            logger.info(f"Resuming interrupted digest {digest['slot_key']}")
+            await deliver_digest(digest['id'], digest['payload'])
+    except Exception as e:
+        logger.error(f"Error resuming digests: {e}", exc_info=True)
+
+async def build_digest_payload():
+    """
+    Fetch news and render an immutable digest payload
+    
+    With the database, news already delivered by recent digests are left out.
+    
+    Returns:
+        Tuple (payload, content_hash, link_hashes); (None, None, None) if no news
+        could be fetched and (None, None, []) if there are no new news
+    """
+    # Get news per source setting
+    news_per_source = get_news_per_source()
+    
+    # Fetch latest news
+    news_items, has_errors = await news_cache.get(news_per_source, force=True)
+    
+    if not news_items:
+        return None, None, None
+    
+    if use_db:
+        # Отбрасываем новости, которые подписчики уже получили в прошлых дайджестах
+        since = datetime.now() - timedelta(hours=config.DIGEST_SEEN_WINDOW_HOURS)
+        delivered = await run_db(outbox.get_delivered_link_hashes, since)
+        fresh_items = [item for item in news_items if delivered.isdisjoint(news_link_hashes(item))]
+        if len(fresh_items) < len(news_items):
+            logger.info(f"Digest: {len(news_items) - len(fresh_items)} of {len(news_items)} news already delivered")
+        news_items = fresh_items
+        if not news_items:
+            return None, None, []
+    
+    link_hashes = list(dict.fromkeys(value for item in news_items for value in news_link_hashes(item)))
+        
+    # Format news message
+    formatted_news, news_with_images = format_news_message(news_items, with_images=True)
+    
+    # Add status information if there were any errors
+    if has_errors:
+        formatted_news += "\n\n⚠️ <i>Некоторые источники новостей временно недоступны</i>"
+    
+    # Add footer
+    formatted_news += "\n\n<i>Это автоматическая рассылка новостей. Чтобы отписаться, используйте команду /отписаться</i>"
+    
+    # Дайджест хранится в виде простых данных, чтобы его можно было дослать после перезапуска
+    payload = {
+        'chunks': split_message(formatted_news),
+        'media': [
+            {
+                'image_url': item['image_url'],
+                'caption': f"<b>{item['title']}</b>\n\n🔗 <a href='{item['link']}'>Читать полностью</a>"
+            }
+            for item in news_with_images[:3] if item.get('image_url')
+        ]
+    }
+    return payload, digest_content_hash(payload), link_hashes
+
+async def prebuild_digest(slot_key):
+    """
+    Build and store the digest for a send slot ahead of time
+    
+    Returns:
+        True if the digest is stored (or the slot no longer needs it)
+    """
+    if not use_db:
+        return True
+    
+    try:
+        payload, content_hash, link_hashes = await build_digest_payload()
+        if payload is None:
+            if link_hashes is not None:
+                # Новые новости могут появиться до отправки - проверим еще раз в момент рассылки
+                logger.info(f"No new news while prebuilding digest {slot_key}")
+                return True
+            logger.warning(f"No news fetched while prebuilding digest {slot_key}")
+            return False
+        await run_db(outbox.save_prebuilt_digest, slot_key, payload, content_hash, link_hashes)
+        return True
+    except Exception as e:
+        logger.error(f"Error prebuilding digest {slot_key}: {e}", exc_info=True)
+        return False
+
+async def send_news_to_subscribers(slot_key=None):
     """Send news to all subscribers"""
     try:
         # Check if bot is active
@@ -1014,75 +1355,43 @@ async def send_news_to_subscribers():
             return
         
         # Get all active subscribers
-        subscribers = get_all_subscribers()
+        subscribers = await run_db(get_all_subscribers)
         if not subscribers:
             logger.info("No active subscribers found")
             return
         
-        # Get news per source setting
-        news_per_source = get_news_per_source()
+        slot_key = slot_key or get_moscow_time().strftime('%Y-%m-%d_%H:%M')
         
-        # Fetch latest news
-        logger.info("Fetching news for scheduled delivery")
-        news_items, has_errors = get_latest_news(news_per_source)
-        
-        if not news_items:
-            logger.warning("No news items fetched for delivery")
+        # Используем дайджест, собранный заранее, если он есть
+        prebuilt = await run_db(outbox.get_digest, slot_key) if use_db else None
+        if prebuilt and prebuilt['status'] != 'ready':
+            logger.info(f"Digest {slot_key} already {prebuilt['status']}, skipping")
             return
-            
-        # Save news items to database if using DB
-        if use_db:
-            save_news_items(news_items)
-            
-        # Format news message
-        formatted_news, news_with_images = format_news_message(news_items, with_images=True)
         
-        # Add status information if there were any errors
-        if has_errors:
-            formatted_news += "\n\n⚠️ <i>Некоторые источники новостей временно недоступны</i>"
-        
-        # Add footer
-        formatted_news += "\n\n<i>Это автоматическая рассылка новостей. Чтобы отписаться, используйте команду /отписаться</i>"
+        if prebuilt:
+            payload, content_hash, link_hashes = prebuilt['payload'], prebuilt['content_hash'], prebuilt['link_hashes']
+        else:
+            logger.info("Fetching news for scheduled delivery")
+            payload, content_hash, link_hashes = await build_digest_payload()
+            if payload is None:
+                if link_hashes is not None:
+                    # С прошлой рассылки ничего нового - пустой дайджест не отправляем
+                    await run_db(outbox.skip_digest, slot_key)
+                    logger.info(f"No new news since the last digest, skipping {slot_key}")
+                    return
+                logger.warning("No news items fetched for delivery")
+                return
         
-        # Send to all subscribers
         logger.info(f"Sending news to {len(subscribers)} subscribers")
-        for user_id in subscribers:
-            try:
-                # Отправляем основной текст новостей
-                await bot.send_message(
-                    user_id,
-                    formatted_news,
-                    parse_mode="HTML",
-                    disable_web_page_preview=True
-                )
-                
-                # Если есть новости с изображениями, отправляем лучшие 3 изображения
-                if news_with_images:
-                    # Ограничиваем количество, чтобы не спамить
-                    images_to_send = news_with_images[:3]
-                    
-                    # Формируем медиа-группу с изображениями
-                    media_group = []
-                    for item in images_to_send:
-                        if item.get('image_url'):
-                            caption = f"<b>{item['title']}</b>\n\n🔗 <a href='{item['link']}'>Читать полностью</a>"
-                            media_group.append(InputMediaPhoto(
-                                media=item['image_url'],
-                                caption=caption,
-                                parse_mode="HTML"
-                            ))
-                    
-                    # Отправляем медиа-группу, если есть изображения
-                    if media_group:
-                        try:
-                            await bot.send_media_group(user_id, media=media_group)
-                        except Exception as e:
-                            logger.error(f"Error sending media to user {user_id}: {e}")
-                
-                # Add a small delay between messages to avoid flood limits
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                logger.error(f"Error sending news to user {user_id}: {e}")
+        if use_db:
+            digest = await run_db(outbox.start_digest, slot_key, payload, content_hash, subscribers, link_hashes)
+            if digest is None:
+                logger.info(f"Digest {slot_key} already exists, skipping")
+                return
+            await deliver_digest(digest['id'], digest['payload'])
+        else:
+            stats = await broadcast_payload(Broadcaster(), payload, subscribers)
+            logger.info(f"Broadcast finished: {stats['sent']} sent, {stats['blocked']} blocked, {stats['failed']} failed")
         
         logger.info("Scheduled news delivery completed")
         
@@ -1119,113 +1428,55 @@ def get_moscow_time():
             
         return moscow_time
 
+async def prebuild_digest_with_retry(slot_key, send_at):
+    """Prebuild a digest, retrying every minute until the send time"""
+    while not await prebuild_digest(slot_key):
+        if (send_at - get_moscow_time()).total_seconds() <= 60:
+            logger.warning(f"Giving up prebuilding digest {slot_key}, it will be built at send time")
+            return
+        await asyncio.sleep(60)
+
+async def send_scheduled_news(slot_key):
+    """Send the digest of a schedule slot"""
+    try:
+        await send_news_to_subscribers(slot_key)
+        logger.info(f"News successfully sent for slot {slot_key}")
+    except Exception as e:
+        logger.error(f"Error sending news: {e}", exc_info=True)
+
+send_scheduler = SendScheduler(
+    load_send_times=get_all_send_times,
+    on_prebuild=prebuild_digest_with_retry,
+    on_send=send_scheduled_news,
+    prebuild_minutes=config.DIGEST_PREBUILD_MINUTES,
+    grace_minutes=config.SCHEDULER_GRACE_MINUTES,
+    max_sleep=config.SCHEDULER_MAX_SLEEP
+)
+
+if settings_cache is not None:
+    # Изменение настроек сразу будит планировщик
+    settings_cache.add_listener(send_scheduler.notify_changed)
+
 async def scheduler():
     """Run scheduled tasks"""
-    startup_log_done = False
-    last_check_times = {}  # Хранит время последней проверки для каждого времени отправки
+    # Досылаем дайджесты, прерванные перезапуском
+    await resume_unfinished_digests()
     
-    while True:
-        try:
-            # Получаем текущее время по Москве - полный datetime объект
-            moscow_datetime = get_moscow_time()
-            now = moscow_datetime.time()
-            
-            # Log the current time for debugging
-            logger.info(f"Scheduler check - current Moscow time: {now.strftime('%H:%M:%S')}")
-            
-            # Get all send times
-            send_times = get_all_send_times()
-            
-            # При первом запуске подробно логируем все настройки
-            if not startup_log_done:
-                time_strings = [t.strftime('%H:%M') for t in send_times]
-                logger.info(f"=== SCHEDULER INITIALIZED ===")
-                logger.info(f"Current Moscow time: {moscow_datetime.strftime('%Y-%m-%d %H:%M:%S')}")
-                logger.info(f"Configured send times: {', '.join(time_strings)}")
-                logger.info(f"Next check will be at xx:xx:00 (checking every minute)")
-                logger.info(f"===============================")
-                startup_log_done = True
-            
-            # Логируем текущее время и времена отправки каждые 5 минут для отладки
-            if moscow_datetime.minute % 5 == 0 and moscow_datetime.second < 5:
-                time_strings = [t.strftime('%H:%M') for t in send_times]
-                logger.info(f"Current Moscow time: {moscow_datetime.strftime('%Y-%m-%d %H:%M:%S')}, Send times: {', '.join(time_strings)}")
-            
-            # Check if it's time to send news
-            for send_time in send_times:
-                # Получаем уникальный ключ для этого времени отправки
-                time_key = send_time.strftime('%H:%M')
-                
-                # Рассчитываем текущее и целевое время в минутах от начала дня
-                current_minutes = now.hour * 60 + now.minute
-                target_minutes = send_time.hour * 60 + send_time.minute
-                
-                # Детальное логирование для отладки - но только когда приближаемся ко времени отправки
-                time_diff = abs(current_minutes - target_minutes)
-                
-                # Проверка на пересечение полуночи
-                if time_diff > 720:  # больше 12 часов - возможно пересечение дня
-                    time_diff = 1440 - time_diff  # 24 часа в минутах
-                
-                # Логирование только если мы близко ко времени или каждые 30 минут
-                if time_diff <= 5 or now.minute % 30 == 0:
-                    logger.info(f"Checking time: current={now.hour}:{now.minute} ({current_minutes} min), target={send_time.hour}:{send_time.minute} ({target_minutes} min), diff={time_diff} min")
-                
-                # Логируем когда приближаемся к времени отправки (в пределах 3 минут)
-                if time_diff <= 3:
-                    logger.info(f"Approaching send time: current={now.strftime('%H:%M')}, target={send_time.strftime('%H:%M')}, diff={time_diff} minutes")
-                
-                # Проверяем, не посылали ли мы уже сегодня в это время
-                today_key = f"{moscow_datetime.date()}_{time_key}"
-                
-                # Изменение логики: если текущее время больше, чем время рассылки, и оно в пределах 15 минут,
-                # и мы еще не отправляли новости сегодня в это время
-                current_hour = now.hour
-                current_minute = now.minute
-                target_hour = send_time.hour
-                target_minute = send_time.minute
-                
-                # Время отправки прошло, но прошло не более 15 минут или мы не отправляли сегодня
-                past_target = (current_hour > target_hour or 
-                              (current_hour == target_hour and current_minute >= target_minute))
-                
-                if past_target and time_diff <= 15 and today_key not in last_check_times:
-                    logger.info(f"!!! Scheduled news delivery triggered at {now.strftime('%H:%M')} MSK time for target {time_key} !!!")
-                    logger.info(f"Current: {current_hour}:{current_minute}, Target: {target_hour}:{target_minute}, Diff: {time_diff} min")
-                    
-                    # Сохраняем информацию о том, что мы обработали это время сегодня
-                    last_check_times[today_key] = moscow_datetime
-                    
-                    # Отправляем новости
-                    try:
-                        await send_news_to_subscribers()
-                        logger.info(f"News successfully sent at {now.strftime('%H:%M')} MSK time")
-                    except Exception as e:
-                        logger.error(f"Error sending news: {e}", exc_info=True)
-                    
-                    # Wait a bit more than a minute to avoid sending twice
-                    await asyncio.sleep(70)
-                    break
-            
-            # Очистим старые записи (старше 24 часов)
-            current_date = moscow_datetime.date()
-            obsolete_keys = [k for k in last_check_times.keys() 
-                            if (current_date - datetime.strptime(k.split('_')[0], '%Y-%m-%d').date()).days >= 1]
-            for k in obsolete_keys:
-                del last_check_times[k]
-            
-            # Check every minute
-            await asyncio.sleep(60)
-            
-        except Exception as e:
-            logger.error(f"Error in scheduler: {e}", exc_info=True)
-            await asyncio.sleep(60)
+    await send_scheduler.run()
 
 async def main():
     """Main function"""
+    # Обновляем снимок настроек, загруженный при импорте (запуск мог быть отложен)
+    if settings_cache is not None:
+        await settings_cache.refresh()
+
     # Start scheduler task
     asyncio.create_task(scheduler())
     
+    # Следим за изменением настроек из других процессов
+    if settings_cache is not None:
+        asyncio.create_task(settings_cache.watch())
+    
     # Регистрируем команды бота
     try:
         await set_bot_commands()
@@ -82,6 +82,19 @@ def stop_bot():
     
     logger.info("Telegram бот остановлен")
 
+def notify_settings_changed():
+    """Сообщить боту, что настройки или расписание рассылок изменились"""
+    if not bot_running or bot_loop is None:
+        return
+    
+    try:
+        from bot import settings_cache
+        if settings_cache is not None:
+            # Слушатели кэша (планировщик) будятся автоматически
+            settings_cache.reload()
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении настроек бота: {e}")
+
 async def shutdown_bot():
     """Корректное завершение работы бота"""
     try:
@@ -91,6 +104,10 @@ async def shutdown_bot():
         # Останавливаем диспетчер и закрываем сессию бота
         await dp.stop_polling()
         await bot.session.close()
+        
+        # Закрываем общий пул HTTP соединений бота
+        import http_client
+        await http_client.close_session()
     except Exception as e:
         logger.error(f"Ошибка при завершении работы бота: {e}")
 
@@ -0,0 +1,154 @@
+"""
+Движок массовой рассылки сообщений подписчикам Telegram бота.
+
+Общий лимит скорости задается token bucket (Telegram допускает около 30
+сообщений в секунду на бота), дополнительно соблюдается интервал между
+сообщениями в один чат. Рассылку выполняют N параллельных воркеров, а при
+ответе RetryAfter отправка приостанавливается ровно на указанное время.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Асинхронный token bucket с возможностью приостановки"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Количество токенов, добавляемых в секунду
+            capacity: Максимальный запас токенов (по умолчанию равен rate)
+        """
+        self._rate = rate
+        self._capacity = capacity if capacity is not None else rate
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены следующие `seconds` секунд"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Дождаться и забрать `tokens` токенов"""
+        tokens = min(tokens, self._capacity)
+        # Под блокировкой ожидающие обслуживаются строго по очереди
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self._rate)
+
+class Broadcaster:
+    """Рассылка по списку чатов с общим лимитом скорости и лимитом на каждый чат"""
+
+    def __init__(self,
+                 rate: float = config.BROADCAST_RATE,
+                 per_chat_interval: float = config.BROADCAST_CHAT_INTERVAL,
+                 workers: int = config.BROADCAST_WORKERS,
+                 max_retries: int = 3):
+        """
+        Args:
+            rate: Общий лимит запросов к Telegram API в секунду
+            per_chat_interval: Минимальный интервал между сообщениями в один чат (секунды)
+            workers: Количество параллельных воркеров
+            max_retries: Сколько раз повторять запрос после RetryAfter
+        """
+        self._bucket = TokenBucket(rate)
+        self._per_chat_interval = per_chat_interval
+        self._workers = max(1, workers)
+        self._max_retries = max_retries
+        self._chat_ready_at: Dict[int, float] = {}
+
+    async def call(self, chat_id: int, request: Callable[[], Awaitable[Any]], cost: int = 1) -> Any:
+        """
+        Выполнить один запрос к Telegram API в рамках лимитов
+
+        Args:
+            chat_id: Чат, в который отправляется сообщение
+            request: Фабрика корутины запроса (вызывается заново при повторе)
+            cost: Сколько сообщений занимает запрос (например, размер медиа-группы)
+        """
+        attempt = 0
+        while True:
+            # Интервал между сообщениями в один чат
+            ready_at = self._chat_ready_at.get(chat_id, 0.0)
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._bucket.acquire(cost)
+            self._chat_ready_at[chat_id] = time.monotonic() + self._per_chat_interval * cost
+
+            try:
+                return await request()
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                logger.warning(f"Flood control for chat {chat_id}: retry after {e.retry_after}s")
+                # Приостанавливаем только на то время, которое попросил Telegram
+                self._bucket.pause(e.retry_after)
+
+    async def run(self, chat_ids: Iterable[int], deliver: Callable[[int], Awaitable[None]],
+                  on_result: Optional[Callable[[int, str, Optional[str]], None]] = None) -> Dict[str, int]:
+        """
+        Разослать сообщения всем чатам
+
+        Args:
+            chat_ids: Идентификаторы чатов
+            deliver: Корутина отправки одному чату, запросы внутри нее выполняются через call()
+            on_result: Вызывается для каждого чата: on_result(chat_id, 'sent' | 'blocked' | 'failed', error)
+
+        Returns:
+            Счетчики {'sent': ..., 'blocked': ..., 'failed': ...}
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        stats = {'sent': 0, 'blocked': 0, 'failed': 0}
+
+        async def worker():
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                error = None
+                try:
+                    await deliver(chat_id)
+                    status = 'sent'
+                except TelegramForbiddenError:
+                    # Пользователь заблокировал бота
+                    status = 'blocked'
+                except Exception as e:
+                    logger.error(f"Error sending news to user {chat_id}: {e}")
+                    status = 'failed'
+                    error = str(e)
+                finally:
+                    self._chat_ready_at.pop(chat_id, None)
+
+                stats[status] += 1
+                if on_result is not None:
+                    on_result(chat_id, status, error)
+
+        await asyncio.gather(*(worker() for _ in range(min(self._workers, queue.qsize()))))
+        return stats
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Проверка планов выполнения частых запросов бота и веб-интерфейса.
+
+Для каждого запроса из bot.py и main.py выполняется EXPLAIN (в SQLite -
+EXPLAIN QUERY PLAN) и проверяется, что таблицы читаются через индексы, а не
+полным сканированием, и что сортировка не требует временной структуры.
+В PostgreSQL последовательное сканирование на время проверки запрещается,
+чтобы на маленькой базе планировщик показал, есть ли подходящий индекс.
+
+Запуск: python check_indexes.py (код возврата 1, если найдены проблемы)
+"""
+import re
+import sys
+
+from sqlalchemy import func, select
+
+from main import app, db, Subscriber, FeedSource, SendTime, NewsItem, Digest, OutboxMessage, TelegramMedia
+
+def hot_queries():
+    """Частые запросы: список (описание, select)"""
+    return [
+        ('Активные подписчики (рассылка)',
+         select(Subscriber.user_id).where(Subscriber.is_active == True)),
+        ('Число активных подписчиков',
+         select(func.count()).select_from(Subscriber).where(Subscriber.is_active == True)),
+        ('Администраторы',
+         select(Subscriber.user_id).where(Subscriber.is_admin == True)),
+        ('Подписчик по user_id',
+         select(Subscriber).where(Subscriber.user_id == 1)),
+        ('Активные источники',
+         select(FeedSource).where(FeedSource.is_active == True)),
+        ('Источник по имени',
+         select(FeedSource).where(FeedSource.name == 'lenta.ru')),
+        ('Активные времена рассылки',
+         select(SendTime).where(SendTime.is_active == True).order_by(SendTime.send_time)),
+        ('Последние новости',
+         select(NewsItem).order_by(NewsItem.created_at.desc(), NewsItem.id.desc()).limit(10)),
+        ('Дайджест слота',
+         select(Digest).where(Digest.slot_key == '2025-01-01_08:00')),
+        ('Очередь рассылки',
+         select(OutboxMessage.user_id)
+         .where(OutboxMessage.digest_id == 1, OutboxMessage.status == 'pending')
+         .order_by(OutboxMessage.id).limit(100)),
+        ('file_id изображений',
+         select(TelegramMedia).where(TelegramMedia.image_url.in_(['https://example.com/a.jpg']))),
+    ]
+
+def explain(stmt):
+    """Получить строки плана выполнения запроса"""
+    dialect = db.engine.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    connection = db.session.connection()
+    if dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+        return [row[-1] for row in rows]
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    rows = connection.exec_driver_sql(f'EXPLAIN {sql}').all()
+    return [row[0] for row in rows]
+
+def find_problems(plan, dialect_name):
+    """Найти в плане полные сканирования таблиц и сортировки без индекса"""
+    problems = []
+    for line in plan:
+        if dialect_name == 'sqlite':
+            if re.match(r'^SCAN \w+$', line.strip()):
+                problems.append(f"полное сканирование: {line.strip()}")
+            elif 'USE TEMP B-TREE' in line:
+                problems.append(f"сортировка без индекса: {line.strip()}")
+        elif 'Seq Scan' in line:
+            problems.append(f"полное сканирование: {line.strip()}")
+    return problems
+
+def main():
+    """Проверить все частые запросы и вывести отчет"""
+    failed = 0
+    with app.app_context():
+        dialect_name = db.engine.dialect.name
+        print(f"База данных: {dialect_name}\n")
+        for title, stmt in hot_queries():
+            plan = explain(stmt)
+            problems = find_problems(plan, dialect_name)
+            print(f"{'OK  ' if not problems else 'FAIL'} {title}")
+            for line in plan:
+                print(f"       {line}")
+            for problem in problems:
+                print(f"     ! {problem}")
+            failed += bool(problems)
+        db.session.rollback()
+
+    print(f"\nПроверено запросов: {len(hot_queries())}, с проблемами: {failed}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Обучение пакетного классификатора рубрик, разметка архива и сравнение скорости.
+
+    python classify_news.py train       - обучить модель на истории новостей
+    python classify_news.py backfill    - заново определить рубрики всех новостей
+    python classify_news.py benchmark   - сравнить скорость рубрикаторов
+
+Обучающая разметка - рубрикатор по ключевым словам (utils.CATEGORY_KEYWORDS),
+примененный ко всему архиву. Модель сохраняется в CLASSIFIER_MODEL_PATH и
+подхватывается при следующем обновлении новостей без перезапуска.
+"""
+import argparse
+import random
+import sys
+import time
+
+from sqlalchemy import update
+
+from config import CLASSIFIER_BATCH_SIZE, CLASSIFIER_MODEL_PATH
+from main import app, db, NewsItem
+from news_classifier import NewsClassifier, load_classifier, news_text, np
+from utils import CATEGORY_KEYWORDS, DEFAULT_CATEGORY, keyword_categories, keyword_matcher
+
+def iter_news(batch_size):
+    """Все новости архива пачками (по возрастанию id)"""
+    last_id = 0
+    while True:
+        batch = (db.session.query(NewsItem.id, NewsItem.title, NewsItem.summary)
+                 .filter(NewsItem.id > last_id).order_by(NewsItem.id).limit(batch_size).all())
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+def train(args):
+    """Обучить модель на архиве, размеченном по ключевым словам"""
+    if np is None:
+        print("Для обучения классификатора нужен NumPy")
+        return 1
+
+    texts = []
+    labels = []
+    with app.app_context():
+        for batch in iter_news(CLASSIFIER_BATCH_SIZE):
+            texts.extend(news_text(row) for row in batch)
+            labels.extend(keyword_categories(batch))
+
+    if not texts:
+        print("В базе нет новостей для обучения")
+        return 1
+
+    started = time.perf_counter()
+    classifier = NewsClassifier.train(texts, labels, alpha=args.alpha, min_count=args.min_count)
+    elapsed = time.perf_counter() - started
+    classifier.save(CLASSIFIER_MODEL_PATH)
+
+    predicted = classifier.predict(texts)
+    agreement = sum(1 for a, b in zip(predicted, labels) if a == b) / len(labels)
+    print(f"Обучено на {len(texts)} новостях за {elapsed:.2f} с: "
+          f"{len(classifier.vocabulary)} основ, {len(classifier.categories)} рубрик")
+    print(f"Совпадение с рубрикатором по ключевым словам: {agreement:.1%}")
+    print(f"Модель сохранена в {CLASSIFIER_MODEL_PATH}")
+    return 0
+
+def backfill(args):
+    """Определить рубрики всех новостей архива"""
+    classifier = load_classifier(CLASSIFIER_MODEL_PATH)
+    if classifier is None:
+        print("Модель не найдена (или не установлен NumPy), используются ключевые слова")
+
+    total = 0
+    started = time.perf_counter()
+    with app.app_context():
+        for batch in iter_news(CLASSIFIER_BATCH_SIZE):
+            if classifier is not None:
+                categories = classifier.predict([news_text(row) for row in batch])
+            else:
+                categories = keyword_categories(batch)
+            db.session.execute(update(NewsItem), [
+                {'id': row.id, 'category': category} for row, category in zip(batch, categories)
+            ])
+            db.session.commit()
+            total += len(batch)
+    print(f"Рубрики обновлены для {total} новостей за {time.perf_counter() - started:.2f} с")
+    return 0
+
+def keyword_loop(items):
+    """Прежний рубрикатор: проверка вхождения каждого ключевого слова каждой рубрики"""
+    result = []
+    for item in items:
+        text = (item.get('title', '') + " " + item.get('summary', '')).lower()
+        category = DEFAULT_CATEGORY
+        max_matches = 0
+        for cat, words in CATEGORY_KEYWORDS.items():
+            matches = sum(1 for word in words if word in text)
+            if matches > max_matches:
+                max_matches = matches
+                category = cat
+        result.append(category)
+    return result
+
+def synthetic_news(count):
+    """Случайные новости из ключевых слов и нейтральных слов"""
+    rng = random.Random(42)
+    keywords = [word for words in CATEGORY_KEYWORDS.values() for word in words]
+    filler = ("в анапе на побережье прошел сегодня жители города администрация сообщила "
+              "ремонт дороги новый проект набережной погода вечером").split()
+    vocabulary = keywords + filler * 4
+    return [{
+        'title': ' '.join(rng.choice(vocabulary) + rng.choice(['', 'а', 'ов', 'ия']) for _ in range(rng.randint(4, 10))),
+        'summary': ' '.join(rng.choice(vocabulary) + rng.choice(['', 'е', 'ам', 'ой']) for _ in range(rng.randint(15, 40)))
+    } for _ in range(count)]
+
+def benchmark(args):
+    """Сравнить скорость рубрикаторов на архиве или на синтетических новостях"""
+    items = []
+    if not args.synthetic:
+        with app.app_context():
+            for batch in iter_news(CLASSIFIER_BATCH_SIZE):
+                items.extend({'title': row.title or '', 'summary': row.summary or ''} for row in batch)
+                if len(items) >= args.items:
+                    break
+    if not items:
+        items = synthetic_news(args.items)
+        print(f"Синтетические новости: {len(items)}")
+    else:
+        items = items[:args.items]
+        print(f"Новости из архива: {len(items)}")
+
+    def measure(title, func):
+        started = time.perf_counter()
+        result = func(items)
+        elapsed = time.perf_counter() - started
+        print(f"{title:<40} {elapsed:8.3f} с {len(items) / elapsed:12,.0f} новостей/с")
+        return result
+
+    baseline = measure("Цикл по ключевым словам (прежний)", keyword_loop)
+    mode = "Ахо-Корасик" if keyword_matcher.uses_automaton else "без pyahocorasick"
+    measure(f"Ключевые слова ({mode})", keyword_categories)
+
+    if np is None:
+        print("NumPy не установлен - пакетный классификатор пропущен")
+        return 0
+
+    classifier = load_classifier(CLASSIFIER_MODEL_PATH)
+    if classifier is None:
+        # Модели еще нет - обучаем на тех же новостях, чтобы было что сравнивать
+        classifier = NewsClassifier.train([news_text(item) for item in items], baseline)
+    def classify_in_batches(batch):
+        # Пачками, как при разметке архива: на очень больших пачках растут накладные расходы памяти
+        result = []
+        for start in range(0, len(batch), CLASSIFIER_BATCH_SIZE):
+            chunk = batch[start:start + CLASSIFIER_BATCH_SIZE]
+            result.extend(classifier.predict([news_text(item) for item in chunk]))
+        return result
+
+    predicted = measure("Пакетный классификатор (NumPy)", classify_in_batches)
+    agreement = sum(1 for a, b in zip(predicted, baseline) if a == b) / len(baseline)
+    print(f"Совпадение классификатора с ключевыми словами: {agreement:.1%}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный классификатор рубрик новостей")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = commands.add_parser('train', help="обучить модель на истории новостей")
+    train_parser.add_argument('--alpha', type=float, default=1.0, help="сглаживание Лапласа")
+    train_parser.add_argument('--min-count', type=int, default=2, help="минимальная частота основы")
+    train_parser.set_defaults(handler=train)
+
+    backfill_parser = commands.add_parser('backfill', help="заново определить рубрики всех новостей")
+    backfill_parser.set_defaults(handler=backfill)
+
+    benchmark_parser = commands.add_parser('benchmark', help="сравнить скорость рубрикаторов")
+    benchmark_parser.add_argument('--items', type=int, default=50000, help="число новостей")
+    benchmark_parser.add_argument('--synthetic', action='store_true', help="не читать архив из базы")
+    benchmark_parser.set_defaults(handler=benchmark)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,3 +22,84 @@ TEST_UPDATE_INTERVAL = 60      # 1 minute (for testing)
 
 # News limits
 NEWS_PER_FEED = 3
+
+# Maximum length of one Telegram message
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Seconds the bot serves news from memory before refreshing feeds
+NEWS_CACHE_TTL = 300
+
+# Feed fetching
+FEED_FETCH_CONCURRENCY = 10  # max simultaneous feed downloads
+FEED_FETCH_TIMEOUT = 15      # seconds per feed
+
+# Shared HTTP connection pool
+HTTP_POOL_LIMIT = 100          # total connections
+HTTP_POOL_LIMIT_PER_HOST = 10  # connections per host
+HTTP_KEEPALIVE_TIMEOUT = 60    # seconds an idle connection is kept open
+HTTP_DNS_CACHE_TTL = 300       # seconds
+
+# Broadcast limits (Telegram allows about 30 messages per second per bot)
+BROADCAST_RATE = 25            # messages per second for all chats
+BROADCAST_CHAT_INTERVAL = 1.0  # seconds between messages to one chat
+BROADCAST_WORKERS = 20         # concurrent delivery workers
+OUTBOX_BATCH_SIZE = 100        # subscribers loaded from the outbox per batch
+OUTBOX_FLUSH_INTERVAL = 1.0    # seconds between saves of delivery statuses during a batch
+OUTBOX_MAX_ATTEMPTS = 3        # failed deliveries are retried until this many attempts
+OUTBOX_RETRY_DELAY = 30        # seconds before failed deliveries are retried
+
+# Digests are built this many minutes before each send time
+DIGEST_PREBUILD_MINUTES = 5
+
+# A scheduled digest skips news already delivered by digests sent within this window
+DIGEST_SEEN_WINDOW_HOURS = 48
+
+# Web pages and JSON APIs return lists in pages of this size (?limit= up to PAGE_SIZE_MAX)
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 500
+
+# NDJSON exports read rows from the database in batches of this size
+EXPORT_BATCH_SIZE = 1000
+
+# Bot /поиск command: maximum number of news items in the reply
+SEARCH_RESULTS_LIMIT = 10
+
+# /api/health serves a snapshot refreshed in the background every N seconds
+HEALTH_SAMPLE_INTERVAL = 5
+# One process of the deployment collects the snapshot and shares it with the others through this file
+HEALTH_SNAPSHOT_FILE = "health_snapshot.json"
+
+# Server-Sent Events: keepalive comment interval and max stream length before the browser reconnects (seconds)
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_DURATION = 60
+# Each open stream holds a gunicorn thread, so a worker serves at most this many (extra clients poll instead)
+SSE_MAX_STREAMS = 2
+
+# Log viewer shows the last N lines of a file (and at most this many bytes) per page
+LOG_TAIL_LINES = 1000
+LOG_TAIL_MAX_BYTES = 512 * 1024
+
+# Log follow mode: how often to stat the file for appended lines (seconds)
+LOG_FOLLOW_POLL_INTERVAL = 1
+
+# Bot settings cache: how often to check the settings version in the database (seconds)
+SETTINGS_CACHE_TTL = 30
+
+# Bot DB queries run in a thread pool of this size (keep below the SQLAlchemy pool size)
+DB_EXECUTOR_WORKERS = 8
+
+# Duplicate stories from different feeds are collapsed into one item (MinHash similarity of title + summary)
+DEDUP_SIMILARITY = 0.5
+DEDUP_WINDOW_HOURS = 48  # how long a story stays in the duplicate index
+DEDUP_INDEX_SIZE = 20000
+
+# News items are upserted in batches of this size
+NEWS_UPSERT_BATCH_SIZE = 500
+
+# Trained news category model (python classify_news.py train); keyword rules are used while it is absent
+CLASSIFIER_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'news_classifier.npz')
+CLASSIFIER_BATCH_SIZE = 2000  # archive rows classified per matrix product
+
+# Scheduler
+SCHEDULER_GRACE_MINUTES = 15  # a missed send time is still delivered within this window
+SCHEDULER_MAX_SLEEP = 900     # seconds; re-read send times at least this often
@@ -0,0 +1,31 @@
+"""
+Ограниченный пул потоков для синхронных запросов к БД из асинхронного бота.
+
+Запросы SQLAlchemy блокируют поток, поэтому обработчики aiogram выполняют их
+в отдельном пуле и не останавливают event loop: медленный запрос одного
+пользователя больше не задерживает ответы остальным. Размер пула ограничен
+DB_EXECUTOR_WORKERS, чтобы не превышать пул соединений SQLAlchemy.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from config import DB_EXECUTOR_WORKERS
+
+T = TypeVar('T')
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='bot-db')
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Выполнить синхронную функцию доступа к БД в пуле потоков
+    
+    Args:
+        func: Функция, открывающая app context и выполняющая запросы
+        
+    Returns:
+        Результат func(*args, **kwargs)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
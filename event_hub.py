@@ -0,0 +1,91 @@
+"""
+Раздача событий Server-Sent Events всем подключенным страницам мониторинга.
+
+Один производитель (фоновый сборщик состояния) публикует событие один раз,
+а концентратор раскладывает его по очередям подписчиков. Поэтому нагрузка на
+сервер не растет с числом открытых вкладок: каждая вкладка только читает
+свою очередь.
+"""
+import json
+import queue
+import threading
+import time
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+Event = Tuple[str, Any]
+
+class EventHub:
+    """Рассылка событий подписчикам через отдельные очереди"""
+
+    def __init__(self, queue_size: int = 100):
+        """
+        Args:
+            queue_size: Сколько событий хранить для медленного клиента (старые отбрасываются)
+        """
+        self._queue_size = queue_size
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> queue.Queue:
+        """Создать очередь нового подписчика"""
+        subscriber: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """Удалить очередь отключившегося подписчика"""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: Any) -> None:
+        """Отправить событие всем подписчикам (не блокируется)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait((event, data))
+                    break
+                except queue.Full:
+                    # Клиент не успевает читать - отбрасываем самое старое событие
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stream(self, initial: Iterable[Event] = (), keepalive: float = 15,
+               max_duration: Optional[float] = None, retry_ms: int = 3000) -> Iterator[str]:
+        """
+        Поток SSE для одного клиента
+
+        Args:
+            initial: События, которые клиент получает сразу после подключения
+            keepalive: Интервал комментариев-пингов при отсутствии событий (секунды)
+            max_duration: Закрыть поток через указанное время, браузер переподключится сам
+            retry_ms: Пауза перед переподключением браузера
+        """
+        subscriber = self.subscribe()
+        started_at = time.monotonic()
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            for event, data in initial:
+                yield format_sse(event, data)
+            while max_duration is None or time.monotonic() - started_at < max_duration:
+                try:
+                    event, data = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            self.unsubscribe(subscriber)
+
+def format_sse(event: str, data: Any) -> str:
+    """Сформировать одно сообщение SSE"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
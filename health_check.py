@@ -16,6 +16,8 @@ from datetime import datetime, timedelta
 import signal
 import asyncio
 
+import http_client
+
 # Настройка логирования
 os.makedirs('logs', exist_ok=True)
 log_file = f'logs/health_check_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
@@ -120,7 +122,7 @@ def check_web_service():
     try:
         # Отправляем GET-запрос на эндпоинт проверки здоровья
         health_url = f"{WEB_URL}/api/health"
-        response = requests.get(health_url, timeout=10)
+        response = http_client.get_sync_session().get(health_url, timeout=10)
         
         # Проверяем статус ответа
         if response.status_code == 200:
@@ -205,7 +207,7 @@ def restart_web_service():
         time.sleep(2)
         
         # Запускаем новый процесс
-        cmd = ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "main:app"]
+        cmd = ["gunicorn", "--bind", "0.0.0.0:5000", "--workers", "2", "--threads", "8", "main:app"]
         subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         logger.info("Веб-сервер успешно перезапущен")
@@ -235,7 +237,7 @@ async def check_telegram_bot():
         bot_info_url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getMe"
         
         # Отправляем запрос
-        response = requests.get(bot_info_url, timeout=10)
+        response = http_client.get_sync_session().get(bot_info_url, timeout=10)
         
         # Проверяем результат
         if response.status_code == 200:
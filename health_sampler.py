@@ -0,0 +1,186 @@
+"""
+Фоновый сбор показателей состояния сервиса для /api/health.
+
+Отдельный поток раз в HEALTH_SAMPLE_INTERVAL секунд собирает загрузку CPU,
+памяти и диска, статистику БД и данные heartbeat.json в готовый снимок, а
+/api/health просто возвращает последний снимок без запросов к БД и без
+ожидания psutil.cpu_percent. Изменения снимка можно получать через
+слушателей (add_listener), например для потока SSE страницы мониторинга.
+
+Если задан shared_path, показатели собирает только один процесс развертывания
+(например, один из воркеров gunicorn): он держит блокировку файла
+shared_path + '.lock' и записывает снимок в shared_path, а остальные процессы
+читают готовый снимок из файла. Если процесс-сборщик завершится, блокировку
+при следующем обновлении заберет другой процесс.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def collect_system_info() -> Dict[str, Any]:
+    """Показатели системы (без блокирующих замеров)"""
+    if psutil is not None:
+        return {
+            "uptime": int(time.time() - psutil.boot_time()),
+            # Загрузка CPU с момента предыдущего замера, без паузы на измерение
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_percent": psutil.disk_usage('/').percent
+        }
+
+    # Если psutil не доступен, используем старый метод
+    system_info = {}
+    try:
+        with open('/proc/uptime', 'r') as f:
+            system_info["uptime"] = float(f.readline().split()[0])
+    except Exception:
+        system_info["uptime"] = None
+    return system_info
+
+def snapshot_delta(snapshot: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Изменившиеся части снимка по сравнению с предыдущим
+
+    Компоненты (components) сравниваются по отдельности, timestamp добавляется
+    только если изменилось что-то еще. Пустой словарь - изменений нет.
+    """
+    if previous is None:
+        return snapshot
+
+    delta = {}
+    for key, value in snapshot.items():
+        if key == 'timestamp':
+            continue
+        if key == 'components' and isinstance(value, dict):
+            previous_components = previous.get('components') or {}
+            changed = {name: part for name, part in value.items() if previous_components.get(name) != part}
+            if changed:
+                delta['components'] = changed
+        elif previous.get(key) != value:
+            delta[key] = value
+    if delta:
+        delta['timestamp'] = snapshot.get('timestamp')
+    return delta
+
+class HealthSampler:
+    """Периодически обновляемый снимок состояния сервиса"""
+
+    def __init__(self, collect: Callable[[], Dict[str, Any]], interval: float,
+                 shared_path: Optional[str] = None):
+        """
+        Args:
+            collect: Функция, собирающая снимок состояния (выполняется в фоновом потоке)
+            interval: Период обновления снимка в секундах
+            shared_path: Файл снимка, общий для всех процессов развертывания
+        """
+        self._collect = collect
+        self._interval = interval
+        self._shared_path = shared_path
+        self._lock_file = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]) -> None:
+        """Вызывать callback(snapshot, previous) после каждого нового снимка (в фоновом потоке)"""
+        self._listeners.append(callback)
+
+    def _is_collector(self) -> bool:
+        """Собирает ли этот процесс показатели (захватывает блокировку, если она свободна)"""
+        if self._shared_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self._shared_path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Health snapshots are collected by process {os.getpid()}")
+        return True
+
+    def _collect_snapshot(self) -> Dict[str, Any]:
+        try:
+            return self._collect()
+        except Exception as e:
+            logger.error(f"Error collecting health snapshot: {e}")
+            return {
+                'status': 'error',
+                'timestamp': datetime.now().isoformat(),
+                'error': str(e)
+            }
+
+    def _write_shared(self, snapshot: Dict[str, Any]) -> None:
+        temp_path = f"{self._shared_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, default=str)
+            os.replace(temp_path, self._shared_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error saving shared health snapshot: {e}")
+
+    def _read_shared(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._shared_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _sample(self) -> Dict[str, Any]:
+        if not self._is_collector():
+            # Пока сборщик не записал первый снимок, собираем его сами
+            return self._read_shared() or self._snapshot or self._collect_snapshot()
+        snapshot = self._collect_snapshot()
+        if self._shared_path is not None:
+            self._write_shared(snapshot)
+        return snapshot
+
+    def _update(self) -> None:
+        previous = self._snapshot
+        self._snapshot = self._sample()
+        for callback in self._listeners:
+            try:
+                callback(self._snapshot, previous)
+            except Exception as e:
+                logger.error(f"Error in health listener: {e}")
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self._interval)
+            self._update()
+
+    def start(self) -> None:
+        """Собрать первый снимок и запустить фоновый поток (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            if psutil is not None:
+                # Первый вызов cpu_percent(None) только начинает отсчет
+                psutil.cpu_percent(interval=None)
+            self._update()
+            self._thread = threading.Thread(target=self._run, name='health-sampler', daemon=True)
+            self._thread.start()
+            logger.info(f"Health sampler started (every {self._interval}s)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Последний снимок состояния (при первом вызове запускает сбор)"""
+        if self._thread is None:
+            self.start()
+        return self._snapshot
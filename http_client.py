@@ -0,0 +1,155 @@
+"""
+Общий пул HTTP соединений для загрузки RSS лент, проверок состояния и Telegram API.
+
+Все клиенты живут весь срок работы процесса, держат keep-alive соединения
+(ограничение на количество соединений на хост) и кэшируют DNS, поэтому
+повторные опросы одних и тех же хостов не тратят время на TCP и TLS рукопожатие.
+"""
+import asyncio
+import logging
+import ssl
+import threading
+import weakref
+from typing import Any, Coroutine, Optional, TypeVar
+
+import aiohttp
+import certifi
+import requests
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from requests.adapters import HTTPAdapter
+
+from config import (
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_CACHE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# aiohttp сессия привязана к event loop, поэтому держим по одной на каждый loop
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+_sync_session: Optional[requests.Session] = None
+_sync_session_lock = threading.Lock()
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+def get_session() -> aiohttp.ClientSession:
+    """Получить общую aiohttp сессию для текущего event loop"""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _async_sessions[loop] = session
+        logger.info("Создан пул HTTP соединений для event loop")
+    return session
+
+async def close_session() -> None:
+    """Закрыть общую aiohttp сессию текущего event loop"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+def get_sync_session() -> requests.Session:
+    """Получить общую синхронную requests сессию с пулом keep-alive соединений"""
+    global _sync_session
+    with _sync_session_lock:
+        if _sync_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_LIMIT_PER_HOST,
+                pool_maxsize=HTTP_POOL_LIMIT_PER_HOST
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sync_session = session
+        return _sync_session
+
+def _run_background_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Выполнить корутину из синхронного кода (например, во Flask маршруте)
+
+    Корутина выполняется в постоянном фоновом event loop, поэтому его
+    aiohttp сессия и открытые соединения переиспользуются между вызовами.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            _background_loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_run_background_loop,
+                args=(_background_loop,),
+                name="http-client-loop",
+                daemon=True
+            )
+            thread.start()
+        loop = _background_loop
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+class BotSession(AiohttpSession):
+    """
+    Сессия aiogram с собственным пулом соединений к Telegram API
+
+    aiogram настраивает в конструкторе только общий лимит соединений, поэтому
+    клиент aiohttp создается здесь (create_session), с лимитом на хост и
+    keep-alive из общих настроек.
+    """
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, **kwargs: Any) -> None:
+        super().__init__(limit=limit, **kwargs)
+        self._pool_limit = limit
+        self._pool_limit_per_host = limit_per_host
+        self._pool_keepalive_timeout = keepalive_timeout
+        self._pool: Optional[aiohttp.ClientSession] = None
+
+    async def create_session(self) -> aiohttp.ClientSession:
+        if self._pool is None or self._pool.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+                limit=self._pool_limit,
+                limit_per_host=self._pool_limit_per_host,
+                keepalive_timeout=self._pool_keepalive_timeout,
+                # DNS кэш как у aiogram - обход проблемы aiogram #1500
+                ttl_dns_cache=3600
+            )
+            self._pool = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': f"{aiohttp.http.SERVER_SOFTWARE} aiogram/{aiogram_version}"}
+            )
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None and not self._pool.closed:
+            await self._pool.close()
+        await super().close()
+
+def create_bot_session() -> BotSession:
+    """
+    Создать сессию aiogram с настройками общего пула соединений
+
+    Бот держит собственный пул, а не общую сессию get_session(): все его запросы
+    идут на один хост (api.telegram.org), и рассылке нужно до BROADCAST_WORKERS
+    соединений к нему - больше, чем HTTP_POOL_LIMIT_PER_HOST для лент. Отдельный
+    пул также не дает загрузке лент отнимать соединения у рассылки, а aiogram
+    использует свой SSL контекст (certifi). Лимиты и keep-alive берутся из общих настроек.
+    """
+    from config import BROADCAST_WORKERS
+
+    return BotSession(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=max(HTTP_POOL_LIMIT_PER_HOST, BROADCAST_WORKERS),
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+    )
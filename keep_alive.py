@@ -88,7 +88,7 @@ def start_web_server():
         logger.info(f"Используемый порт: {port}")
         
         # Команда запуска
-        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "--timeout", "120", "main:app"]
+        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "--threads", "8", "--timeout", "120", "main:app"]
         logger.info(f"Команда запуска: {' '.join(cmd)}")
         
         # Открываем лог-файл
@@ -0,0 +1,155 @@
+"""
+Чтение конца лог-файла без загрузки всего файла в память.
+
+Файл читается блоками от конца (или от заданного смещения) назад, пока не
+набрано нужное число строк, поэтому время чтения зависит только от размера
+окна, а не от размера файла. Смещение начала окна используется как курсор
+для перехода к более ранним строкам, а смещение конца - для чтения только
+дописанных строк при слежении за файлом.
+"""
+import os
+import time
+from typing import Iterator, NamedTuple, Optional
+
+class LogWindow(NamedTuple):
+    """Фрагмент лог-файла"""
+    text: str    # Текст фрагмента (целые строки)
+    start: int   # Смещение начала фрагмента в байтах
+    end: int     # Смещение конца фрагмента в байтах
+    size: int    # Размер файла в байтах
+
+def read_tail(path: str, max_lines: int, end: Optional[int] = None,
+              max_bytes: int = 512 * 1024, block_size: int = 64 * 1024) -> LogWindow:
+    """
+    Прочитать последние строки файла
+
+    Args:
+        path: Путь к файлу
+        max_lines: Максимальное число строк
+        end: Читать строки, заканчивающиеся до этого смещения (None - до конца файла)
+        max_bytes: Ограничение размера фрагмента в байтах
+        block_size: Размер блока чтения
+
+    Returns:
+        LogWindow с текстом и смещениями фрагмента
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        end = size if end is None else max(0, min(end, size))
+
+        start = end
+        chunks = []
+        newlines = 0
+        # Читаем назад, пока не наберем max_lines полных строк (нужен еще один перевод строки перед ними)
+        while start > 0 and newlines <= max_lines and end - start < max_bytes:
+            read_size = min(block_size, start, max_bytes - (end - start))
+            start -= read_size
+            f.seek(start)
+            chunk = f.read(read_size)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+
+    data = b''.join(reversed(chunks))
+
+    # Отбрасываем неполную первую строку, если остановились не в начале файла
+    if start > 0:
+        cut = data.find(b'\n')
+        if cut != -1 and cut + 1 < len(data):
+            data = data[cut + 1:]
+            start += cut + 1
+
+    lines = data.splitlines(keepends=True)
+    if len(lines) > max_lines:
+        dropped = lines[:-max_lines]
+        start += sum(len(line) for line in dropped)
+        lines = lines[-max_lines:]
+
+    return LogWindow(b''.join(lines).decode('utf-8', errors='replace'), start, end, size)
+
+class LogChunk(NamedTuple):
+    """Новые данные лог-файла после смещения"""
+    text: str     # Новые целые строки
+    offset: int   # Смещение, с которого читать в следующий раз
+    size: int     # Размер файла в байтах
+    reset: bool   # Файл был очищен или заменен - чтение начато с начала
+    inode: int    # Номер inode файла: по нему в следующий раз видно, что файл заменили
+
+def read_from(path: str, offset: Optional[int], max_bytes: int = 512 * 1024,
+              inode: Optional[int] = None) -> LogChunk:
+    """
+    Прочитать строки, дописанные в файл после смещения offset
+
+    Возвращаются только целые строки: незавершенная последняя строка будет
+    прочитана при следующем вызове.
+
+    Args:
+        path: Путь к файлу
+        offset: Смещение из предыдущего вызова (None - начать с текущего конца файла)
+        max_bytes: Максимальный объем данных за один вызов
+        inode: inode из предыдущего вызова (None - не проверять замену файла)
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    if offset is None:
+        return LogChunk('', size, size, False, stat.st_ino)
+
+    # Файл стал короче (его очистили) или на его месте другой файл (ротация) -
+    # старое смещение к нему не относится
+    reset = offset > size or (inode is not None and inode != stat.st_ino)
+    if reset:
+        offset = 0
+    if offset == size:
+        return LogChunk('', offset, size, reset, stat.st_ino)
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(min(size - offset, max_bytes))
+
+    last_newline = data.rfind(b'\n')
+    if last_newline == -1:
+        # Строка длиннее max_bytes отдается частями, иначе ждем ее завершения
+        if len(data) < max_bytes:
+            return LogChunk('', offset, size, reset, stat.st_ino)
+    else:
+        data = data[:last_newline + 1]
+
+    return LogChunk(data.decode('utf-8', errors='replace'), offset + len(data), size, reset, stat.st_ino)
+
+def follow(path: str, offset: Optional[int], poll_interval: float = 1.0,
+           max_bytes: int = 512 * 1024, inode: Optional[int] = None) -> Iterator[Optional[LogChunk]]:
+    """
+    Следить за файлом: бесконечно выдавать новые строки по мере их появления
+
+    Изменения определяются по os.stat (размер и время изменения), файл
+    открывается только когда он действительно изменился. Если файл заменили
+    (сменился inode), он читается с начала, и чанк помечается reset. Когда
+    новых строк нет, выдается None (раз в poll_interval), чтобы вызывающий мог
+    отправить keepalive или завершить поток.
+    """
+    chunk = read_from(path, offset, max_bytes, inode)
+    offset, inode = chunk.offset, chunk.inode
+    if chunk.text or chunk.reset:
+        yield chunk
+
+    last_stat = None
+    while True:
+        try:
+            stat = os.stat(path)
+            current = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        except FileNotFoundError:
+            current = None
+
+        if current is not None and current != last_stat:
+            last_stat = current
+            chunk = read_from(path, offset, max_bytes, inode)
+            offset, inode = chunk.offset, chunk.inode
+            if chunk.text or chunk.reset:
+                yield chunk
+                # Данные могли прийти быстрее max_bytes за итерацию - дочитываем без паузы
+                if chunk.offset < chunk.size:
+                    last_stat = None
+                continue
+
+        yield None
+        time.sleep(poll_interval)
@@ -5,16 +5,24 @@ import time
 import psutil
 import zipfile
 import logging
+import threading
 import subprocess
 from datetime import datetime, timedelta, time as datetime_time
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Time
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Time, Index, UniqueConstraint, inspect, text
 from sqlalchemy.sql import func
 
+from config import HEALTH_SAMPLE_INTERVAL, HEALTH_SNAPSHOT_FILE, SSE_MAX_STREAMS
+from event_hub import EventHub, format_sse
+from health_sampler import HealthSampler, collect_system_info, snapshot_delta
+from log_reader import follow, read_from, read_tail
+from news_search import search_news_ids, setup_search_index
+from pagination import paginate, parse_limit
+
 # Create database first
 class Base(DeclarativeBase):
     pass
@@ -71,11 +79,13 @@ def inject_bot_username():
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///anapa_news.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
-    "pool_pre_ping": True,
-    "connect_args": {
+    "pool_pre_ping": True
+}
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("postgres"):
+    # Параметр сеанса PostgreSQL; sqlite3.connect такого аргумента не принимает
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {
         "options": "-c timezone=Europe/Moscow"
     }
-}
 
 # Initialize the app with the extension
 db.init_app(app)
@@ -96,6 +106,12 @@ class Subscriber(db.Model):
     created_at = Column(DateTime, default=func.now())
     last_updated = Column(DateTime, default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        # Рассылка и счетчики выбирают активных подписчиков, is_admin - список администраторов
+        Index('ix_subscribers_active_user', 'is_active', 'user_id'),
+        Index('ix_subscribers_admin_user', 'is_admin', 'user_id'),
+    )
+    
     def __repr__(self):
         return f"<Subscriber {self.user_id}>"
     
@@ -121,9 +137,18 @@ class FeedSource(db.Model):
     name = Column(String(100), nullable=False)
     url = Column(String(255), nullable=False, unique=True)
     is_active = Column(Boolean, default=True)
+    # HTTP cache validators and entries parsed from the last 200 response
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(100), nullable=True)
+    cached_entries = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=func.now())
     last_updated = Column(DateTime, default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        Index('ix_feed_sources_active', 'is_active'),
+        Index('ix_feed_sources_name', 'name'),
+    )
+    
     def __repr__(self):
         return f"<FeedSource {self.name}>"
     
@@ -146,6 +171,7 @@ class BotSettings(db.Model):
     news_per_source = Column(Integer, default=3)
     daily_send_time = Column(Time, default=func.time(8, 0))  # 8:00 AM по Москве
     telegram_token = Column(String(255), nullable=True)
+    settings_version = Column(Integer, default=0)  # увеличивается при каждом изменении настроек или расписания
     last_updated = Column(DateTime, default=func.now(), onupdate=func.now())
     
     def __repr__(self):
@@ -170,6 +196,10 @@ class SendTime(db.Model):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=func.now())
     
+    __table_args__ = (
+        Index('ix_send_times_active_time', 'is_active', 'send_time'),
+    )
+    
     def __repr__(self):
         return f"<SendTime {self.send_time.strftime('%H:%M')}>"
     
@@ -192,8 +222,15 @@ class NewsItem(db.Model):
     summary = Column(String(1000), nullable=True)
     pub_date = Column(String(50), nullable=True)
     feed_id = Column(Integer, ForeignKey('feed_sources.id'), nullable=True)
+    category = Column(String(50), nullable=True)  # Рубрика (классификатор или ключевые слова)
     created_at = Column(DateTime, default=func.now())
     
+    __table_args__ = (
+        Index('uq_news_feed_link', 'feed_id', 'link', unique=True),
+        # Списки новостей сортируются по времени добавления
+        Index('ix_news_items_created_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f"<NewsItem {self.title}>"
     
@@ -206,9 +243,67 @@ class NewsItem(db.Model):
             'summary': self.summary,
             'pub_date': self.pub_date,
             'feed_id': self.feed_id,
+            'category': self.category,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
+class Digest(db.Model):
+    """Scheduled news digest, one row per send slot"""
+    __tablename__ = 'digests'
+    
+    id = Column(Integer, primary_key=True)
+    slot_key = Column(String(50), unique=True, nullable=False)  # e.g. 2025-04-23_08:00
+    status = Column(String(20), default='sending')  # ready / sending / done / skipped / expired
+    payload = Column(JSON, nullable=True)  # message chunks and media sent to every subscriber
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of payload
+    link_hashes = Column(JSON, nullable=True)  # short hashes of the news links in the digest
+    created_at = Column(DateTime, default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Digest {self.slot_key}>"
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'slot_key': self.slot_key,
+            'status': self.status,
+            'content_hash': self.content_hash,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None
+        }
+
+class OutboxMessage(db.Model):
+    """Delivery of one digest to one subscriber"""
+    __tablename__ = 'outbox_messages'
+    __table_args__ = (
+        UniqueConstraint('digest_id', 'user_id', name='uq_outbox_digest_user'),
+        Index('ix_outbox_digest_status', 'digest_id', 'status'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    digest_id = Column(Integer, ForeignKey('digests.id'), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    status = Column(String(20), default='pending')  # pending / sent / blocked / failed / expired
+    error = Column(String(500), nullable=True)
+    attempts = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<OutboxMessage {self.digest_id}:{self.user_id} {self.status}>"
+
+class TelegramMedia(db.Model):
+    """Telegram file_id of an image already uploaded once, keyed by source URL"""
+    __tablename__ = 'telegram_media'
+    
+    id = Column(Integer, primary_key=True)
+    image_url = Column(String(1000), nullable=False, unique=True)
+    file_id = Column(String(255), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<TelegramMedia {self.image_url}>"
+
 # Define routes
 @app.route('/')
 def home():
@@ -233,10 +328,20 @@ def home():
 
 @app.route('/subscribers')
 def subscribers():
-    """Show all subscribers"""
-    subscribers_list = Subscriber.query.all()
+    """Show subscribers, one page at a time"""
+    limit = parse_limit(request.args.get('limit', type=int))
+    cursor = request.args.get('cursor')
+    try:
+        subscribers_list, next_cursor = paginate(Subscriber.query, [Subscriber.user_id], limit, cursor)
+    except ValueError:
+        flash('Неверная ссылка на страницу, показана первая страница', 'warning')
+        cursor = None
+        subscribers_list, next_cursor = paginate(Subscriber.query, [Subscriber.user_id], limit)
     return render_template('subscribers.html', 
                           subscribers=subscribers_list, 
+                          next_cursor=next_cursor,
+                          cursor=cursor,
+                          limit=limit,
                           title="Подписчики")
 
 @app.route('/subscribers/add', methods=['POST'])
@@ -293,7 +398,9 @@ def toggle_admin(subscriber_id):
     """Toggle subscriber admin status"""
     subscriber = Subscriber.query.get_or_404(subscriber_id)
     subscriber.is_admin = not subscriber.is_admin
+    bump_settings_version()
     db.session.commit()
+    bot_runner.notify_settings_changed()
     
     status = "назначен администратором" if subscriber.is_admin else "лишен прав администратора"
     flash(f'Подписчик с ID {subscriber.user_id} {status}', 'success')
@@ -303,8 +410,13 @@ def toggle_admin(subscriber_id):
 def delete_subscriber(subscriber_id):
     """Delete a subscriber"""
     subscriber = Subscriber.query.get_or_404(subscriber_id)
+    was_admin = subscriber.is_admin
     db.session.delete(subscriber)
+    if was_admin:
+        bump_settings_version()
     db.session.commit()
+    if was_admin:
+        bot_runner.notify_settings_changed()
     
     flash(f'Подписчик с ID {subscriber.user_id} удален', 'success')
     return redirect(url_for('subscribers'))
@@ -384,6 +496,15 @@ def settings():
                           send_times=send_times,
                           title="Настройки бота")
 
+def bump_settings_version(bot_settings=None):
+    """Increment the settings version so running bots reload their cached settings"""
+    if bot_settings is None:
+        bot_settings = BotSettings.query.first()
+        if not bot_settings:
+            bot_settings = BotSettings()
+            db.session.add(bot_settings)
+    bot_settings.settings_version = (bot_settings.settings_version or 0) + 1
+
 @app.route('/settings/update', methods=['POST'])
 def update_settings():
     """Update bot settings"""
@@ -414,8 +535,10 @@ def update_settings():
         telegram_token = request.form.get('telegram_token')
         if telegram_token:
             bot_settings.telegram_token = telegram_token
-            
+        
+        bump_settings_version(bot_settings)
         db.session.commit()
+        bot_runner.notify_settings_changed()
         flash('Настройки бота обновлены', 'success')
         
         return redirect(url_for('settings'))
@@ -439,6 +562,7 @@ def add_send_time():
             
             if existing:
                 existing.is_active = True
+                bump_settings_version()
                 db.session.commit()
                 flash(f'Время рассылки {send_time_str} активировано', 'success')
             else:
@@ -447,8 +571,10 @@ def add_send_time():
                     is_active=True
                 )
                 db.session.add(new_time)
+                bump_settings_version()
                 db.session.commit()
                 flash(f'Время рассылки {send_time_str} добавлено', 'success')
+            bot_runner.notify_settings_changed()
         
         return redirect(url_for('settings'))
     except Exception as e:
@@ -460,7 +586,9 @@ def toggle_send_time(time_id):
     """Toggle send time active status"""
     send_time = SendTime.query.get_or_404(time_id)
     send_time.is_active = not send_time.is_active
+    bump_settings_version()
     db.session.commit()
+    bot_runner.notify_settings_changed()
     
     time_str = send_time.send_time.strftime('%H:%M')
     status = "активировано" if send_time.is_active else "деактивировано"
@@ -473,17 +601,31 @@ def delete_send_time(time_id):
     send_time = SendTime.query.get_or_404(time_id)
     time_str = send_time.send_time.strftime('%H:%M')
     db.session.delete(send_time)
+    bump_settings_version()
     db.session.commit()
+    bot_runner.notify_settings_changed()
     
     flash(f'Время рассылки {time_str} удалено', 'success')
     return redirect(url_for('settings'))
 
 @app.route('/news')
 def news():
-    """Show all cached news items"""
-    news_items = NewsItem.query.order_by(NewsItem.created_at.desc()).all()
+    """Show cached news items, newest first, one page at a time"""
+    limit = parse_limit(request.args.get('limit', type=int))
+    cursor = request.args.get('cursor')
+    # Ключ - только id: created_at в SQLite хранится строкой без микросекунд и не совпадает с курсором
+    key = [NewsItem.id]
+    try:
+        news_items, next_cursor = paginate(NewsItem.query, key, limit, cursor, descending=True)
+    except ValueError:
+        flash('Неверная ссылка на страницу, показана первая страница', 'warning')
+        cursor = None
+        news_items, next_cursor = paginate(NewsItem.query, key, limit, descending=True)
     return render_template('news.html', 
                           news_items=news_items, 
+                          next_cursor=next_cursor,
+                          cursor=cursor,
+                          limit=limit,
                           title="Новости")
 
 @app.route('/news/fetch', methods=['POST'])
@@ -498,30 +640,8 @@ def fetch_news():
         # Fetch latest news
         news_items, has_errors = get_latest_news(news_per_source)
         
-        # Save to database
-        # Clear existing news
-        NewsItem.query.delete()
-        
-        # Add new items
-        for item in news_items:
-            # Find the feed source
-            feed_source = None
-            if 'source' in item:
-                feed_source = FeedSource.query.filter_by(name=item['source']).first()
-            
-            feed_id = feed_source.id if feed_source else None
-            
-            news_item = NewsItem(
-                title=item['title'],
-                link=item['link'],
-                source=item.get('source', ''),
-                summary=item.get('summary', ''),
-                pub_date=item.get('pub_date', ''),
-                feed_id=feed_id
-            )
-            db.session.add(news_item)
-        
-        db.session.commit()
+        # Save to database (keeps history, updates known items)
+        upsert_news_items(news_items)
         
         # Add status information if there were any errors
         if has_errors:
@@ -551,12 +671,73 @@ def api_feeds():
 
 @app.route('/api/subscribers', methods=['GET'])
 def api_subscribers():
-    """API to get subscribers as JSON"""
+    """API to get active subscribers as JSON (paginated: ?limit=&cursor=)"""
     try:
-        subscribers = Subscriber.query.filter_by(is_active=True).all()
+        limit = parse_limit(request.args.get('limit', type=int))
+        subscribers, next_cursor = paginate(Subscriber.query.filter_by(is_active=True), [Subscriber.user_id],
+                                            limit, request.args.get('cursor'))
         return jsonify({
             'success': True,
-            'subscribers': [sub.to_dict() for sub in subscribers]
+            'subscribers': [sub.to_dict() for sub in subscribers],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+def ndjson_response(query, filename):
+    """Stream query rows as newline-delimited JSON (one to_dict() object per line)"""
+    from config import EXPORT_BATCH_SIZE
+    
+    def generate():
+        # yield_per читает строки порциями через серверный курсор, не загружая всю таблицу в память
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            yield json.dumps(row.to_dict(), ensure_ascii=False) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/api/subscribers/export', methods=['GET'])
+def api_subscribers_export():
+    """Export subscribers as NDJSON stream (?active=1 for active subscribers only)"""
+    query = Subscriber.query
+    if request.args.get('active') == '1':
+        query = query.filter_by(is_active=True)
+    return ndjson_response(query.order_by(Subscriber.user_id), 'subscribers.ndjson')
+
+@app.route('/api/news/export', methods=['GET'])
+def api_news_export():
+    """Export all stored news items as NDJSON stream, newest first"""
+    query = NewsItem.query.order_by(NewsItem.created_at.desc(), NewsItem.id.desc())
+    return ndjson_response(query, 'news.ndjson')
+
+@app.route('/api/news/search', methods=['GET'])
+def api_news_search():
+    """API for full-text news search: ?q=<words>&limit=<n>, most relevant first"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Query parameter q is required'
+        }), 400
+    
+    try:
+        limit = parse_limit(request.args.get('limit', type=int))
+        news_items = search_news(query, limit)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'news': [item.to_dict() for item in news_items]
         })
     except Exception as e:
         return jsonify({
@@ -586,110 +767,117 @@ def api_settings():
 
 @app.route('/api/news', methods=['GET'])
 def api_news():
-    """API to get cached news items as JSON"""
+    """API to get cached news items as JSON, newest first (paginated: ?limit=&cursor=)"""
     try:
-        news_items = NewsItem.query.order_by(NewsItem.created_at.desc()).all()
+        limit = parse_limit(request.args.get('limit', type=int))
+        news_items, next_cursor = paginate(NewsItem.query, [NewsItem.id],
+                                           limit, request.args.get('cursor'), descending=True)
         return jsonify({
             'success': True,
-            'news': [item.to_dict() for item in news_items]
+            'news': [item.to_dict() for item in news_items],
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         })
 
-@app.route('/api/health', methods=['GET'])
-def api_health():
-    """API для проверки состояния сервиса (heartbeat)"""
-    import os
-    import json
-    import time
-    from datetime import datetime
-    
-    # Проверка базы данных
-    db_ok = True
-    db_error = None
-    try:
-        db.session.execute(db.select(BotSettings).limit(1))
-    except Exception as e:
-        db_ok = False
-        db_error = str(e)
-    
-    # Проверка настроек бота
-    bot_settings = BotSettings.query.first()
-    bot_active = bot_settings.is_active if bot_settings else False
-    
-    # Проверка наличия telegram_token
-    token_exists = bool(bot_settings and bot_settings.telegram_token)
-    
-    # Сбор информации о системе с помощью psutil
-    system_info = {}
-    try:
-        import psutil
-        system_info = {
-            "uptime": int(time.time() - psutil.boot_time()),
-            "cpu_percent": psutil.cpu_percent(interval=0.1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage('/').percent
-        }
-    except ImportError:
-        # Если psutil не доступен, используем старый метод
-        try:
-            with open('/proc/uptime', 'r') as f:
-                system_info["uptime"] = float(f.readline().split()[0])
-        except:
-            system_info["uptime"] = None
-    
-    # Проверка heartbeat файла если он существует
-    heartbeat_data = {}
-    heartbeat_file = "heartbeat.json"
-    if os.path.exists(heartbeat_file):
+def collect_health_snapshot():
+    """Collect service health data for /api/health (runs in the health sampler thread)"""
+    with app.app_context():
+        # Проверка базы данных
+        db_ok = True
+        db_error = None
         try:
-            with open(heartbeat_file, 'r') as f:
-                heartbeat_data = json.load(f)
-        except:
-            pass
-    
-    # Получение информации о подписчиках
-    subscribers_count = Subscriber.query.filter_by(is_active=True).count()
-    
-    # Получение информации о новостях
-    news_count = NewsItem.query.count()
-    latest_news = NewsItem.query.order_by(NewsItem.created_at.desc()).first()
-    latest_news_time = latest_news.created_at.isoformat() if latest_news else None
-    
-    # Получение информации о источниках
-    feeds_count = FeedSource.query.filter_by(is_active=True).count()
-    
-    # Отправка ответа
-    response = {
-        'status': 'ok' if db_ok else 'error',
-        'timestamp': datetime.now().isoformat(),
-        'components': {
-            'database': {
-                'status': 'healthy' if db_ok else 'error',
-                'error': db_error
-            },
-            'bot': {
-                'active': bot_active,
-                'token_exists': token_exists
-            },
-            'system': system_info,
-            'stats': {
-                'subscribers': subscribers_count,
-                'news_items': news_count,
-                'latest_news_time': latest_news_time,
-                'active_feeds': feeds_count
+            db.session.execute(db.select(BotSettings).limit(1))
+        except Exception as e:
+            db_ok = False
+            db_error = str(e)
+            db.session.rollback()
+        
+        bot_active = False
+        token_exists = False
+        stats = {}
+        if db_ok:
+            # Проверка настроек бота
+            bot_settings = BotSettings.query.first()
+            bot_active = bot_settings.is_active if bot_settings else False
+            
+            # Проверка наличия telegram_token
+            token_exists = bool(bot_settings and bot_settings.telegram_token)
+            
+            # Получение информации о новостях
+            latest_news = NewsItem.query.order_by(NewsItem.created_at.desc()).first()
+            
+            stats = {
+                'subscribers': Subscriber.query.filter_by(is_active=True).count(),
+                'news_items': NewsItem.query.count(),
+                'latest_news_time': latest_news.created_at.isoformat() if latest_news else None,
+                'active_feeds': FeedSource.query.filter_by(is_active=True).count()
+            }
+        
+        # Проверка heartbeat файла если он существует
+        heartbeat_data = {}
+        heartbeat_file = "heartbeat.json"
+        if os.path.exists(heartbeat_file):
+            try:
+                with open(heartbeat_file, 'r') as f:
+                    heartbeat_data = json.load(f)
+            except:
+                pass
+        
+        snapshot = {
+            'status': 'ok' if db_ok else 'error',
+            'timestamp': datetime.now().isoformat(),
+            'components': {
+                'database': {
+                    'status': 'healthy' if db_ok else 'error',
+                    'error': db_error
+                },
+                'bot': {
+                    'active': bot_active,
+                    'token_exists': token_exists
+                },
+                'system': collect_system_info(),
+                'stats': stats
             }
         }
-    }
-    
-    # Добавляем данные heartbeat, если они есть
-    if heartbeat_data:
-        response['heartbeat'] = heartbeat_data
-    
-    return jsonify(response)
+        
+        # Добавляем данные heartbeat, если они есть
+        if heartbeat_data:
+            snapshot['heartbeat'] = heartbeat_data
+        
+        # Последние лог-файлы для страницы мониторинга
+        try:
+            snapshot['log_files'] = list_log_files('all')[:5]
+        except OSError:
+            snapshot['log_files'] = []
+        
+        return snapshot
+
+def publish_health_changes(snapshot, previous):
+    """Push the changed parts of a new health snapshot to connected monitor pages"""
+    delta = snapshot_delta(snapshot, previous)
+    if delta:
+        monitor_events.publish('health', delta)
+
+# Состояние собирает один процесс развертывания, остальные воркеры читают его снимок из файла;
+# изменения раздаются всем открытым страницам мониторинга
+health_sampler = HealthSampler(collect_health_snapshot, interval=HEALTH_SAMPLE_INTERVAL,
+                               shared_path=HEALTH_SNAPSHOT_FILE)
+monitor_events = EventHub()
+health_sampler.add_listener(publish_health_changes)
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """API для проверки состояния сервиса (heartbeat), отдает последний снимок фонового сборщика"""
+    return jsonify(health_sampler.snapshot())
 
 # Функция для инициализации админов
 def initialize_admins():
@@ -720,9 +908,125 @@ def initialize_admins():
     
     db.session.commit()
 
+# Statements that must run before a unique index can be created on an existing table
+INDEX_PREPARE_SQL = {
+    # До появления upsert новости могли дублироваться - оставляем последнюю копию
+    'uq_news_feed_link': 'DELETE FROM news_items WHERE id NOT IN '
+                         '(SELECT MAX(id) FROM news_items GROUP BY feed_id, link)',
+}
+
+def upgrade_schema():
+    """Add columns and indexes introduced after the tables were first created (create_all skips existing tables)"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            print(f"Добавлена колонка {table.name}.{column.name}")
+        db.session.commit()
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            if index.name in INDEX_PREPARE_SQL:
+                db.session.execute(text(INDEX_PREPARE_SQL[index.name]))
+                db.session.commit()
+            index.create(db.engine)
+            print(f"Добавлен индекс {table.name}.{index.name}")
+
+def upsert_news_items(news_items):
+    """
+    Save fetched news items, updating items that are already stored
+    
+    Items are matched by (feed_id, link), so the news history is kept and a
+    refresh costs one feed lookup plus one batched statement per
+    NEWS_UPSERT_BATCH_SIZE items. Must be called inside an app context.
+    
+    Returns:
+        Number of saved items
+    """
+    if not news_items:
+        return 0
+    
+    # Источники загружаем одним запросом: сначала ищем по URL ленты, затем по имени
+    feeds = db.session.query(FeedSource.id, FeedSource.url, FeedSource.name).all()
+    feed_ids_by_url = {feed.url: feed.id for feed in feeds}
+    feed_ids_by_name = {feed.name: feed.id for feed in feeds}
+    
+    rows = {}
+    for item in news_items:
+        feed_id = feed_ids_by_url.get(item.get('feed_url')) or feed_ids_by_name.get(item.get('source', ''))
+        # Одна строка на ключ: повторное обновление той же строки в одном INSERT недопустимо
+        rows[(feed_id, item['link'])] = {
+            'title': item['title'][:255],
+            'link': item['link'],
+            'source': (item.get('source') or '')[:100],
+            'summary': (item.get('summary') or '')[:1000],
+            'pub_date': item.get('pub_date') or '',
+            'feed_id': feed_id,
+            'category': item.get('category')
+        }
+    rows = list(rows.values())
+    
+    # Рубрики, не определенные при загрузке, - одним вызовом классификатора на пачку
+    from utils import news_categories
+    for row, category in zip(rows, news_categories(rows)):
+        row['category'] = category
+    
+    # NULL не совпадает с NULL в уникальном индексе, поэтому новости без источника заменяем явно
+    orphan_links = [row['link'] for row in rows if row['feed_id'] is None]
+    if orphan_links:
+        NewsItem.query.filter(NewsItem.feed_id.is_(None), NewsItem.link.in_(orphan_links)).delete(synchronize_session=False)
+    
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Upsert is not supported for database dialect {dialect}")
+    
+    from config import NEWS_UPSERT_BATCH_SIZE
+    for start in range(0, len(rows), NEWS_UPSERT_BATCH_SIZE):
+        stmt = dialect_insert(NewsItem).values(rows[start:start + NEWS_UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['feed_id', 'link'],
+            set_={
+                'title': stmt.excluded.title,
+                'source': stmt.excluded.source,
+                'summary': stmt.excluded.summary,
+                'pub_date': stmt.excluded.pub_date,
+                'category': stmt.excluded.category
+            }
+        )
+        db.session.execute(stmt)
+    
+    db.session.commit()
+    return len(rows)
+
+def search_news(query, limit):
+    """
+    Full-text search over stored news items, most relevant first
+    
+    Must be called inside an app context.
+    """
+    ranked_ids = [news_id for news_id, _ in search_news_ids(db.session, query, limit)]
+    if not ranked_ids:
+        return []
+    items_by_id = {item.id: item for item in NewsItem.query.filter(NewsItem.id.in_(ranked_ids))}
+    return [items_by_id[news_id] for news_id in ranked_ids if news_id in items_by_id]
+
 # Create DB tables on startup
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+    setup_search_index(db.engine)
     
     # Initialize default RSS feeds if there are none
     if FeedSource.query.count() == 0:
@@ -786,19 +1090,31 @@ def view_logs():
     log_size = '0 bytes'
     log_update_time = 'неизвестно'
     can_clear = False
+    earlier_offset = None
+    follow_offset = None
+    follow_inode = None
+    
+    # Окно просмотра: последние N строк до смещения before (для перехода к более ранним строкам)
+    from config import LOG_TAIL_LINES, LOG_TAIL_MAX_BYTES
+    lines = max(1, min(request.args.get('lines', LOG_TAIL_LINES, type=int) or LOG_TAIL_LINES, 10000))
+    before = request.args.get('before', type=int)
     
     if log_file and log_file in log_files:
         file_path = os.path.join(logs_dir, log_file)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                log_content = f.read()
-            
-            # Ограничиваем размер контента
-            if len(log_content) > 500000:  # ~500KB
-                log_content = "... [начало файла обрезано] ...\n\n" + log_content[-500000:]
+            # Читаем только конец файла, не загружая его целиком
+            window = read_tail(file_path, lines, end=before, max_bytes=LOG_TAIL_MAX_BYTES)
+            log_content = window.text
+            if window.start > 0:
+                log_content = "... [более ранние строки - по ссылке «Раньше»] ...\n\n" + log_content
+                earlier_offset = window.start
+            # Слежение за файлом продолжается с конца показанного окна
+            if before is None:
+                follow_offset = window.end
             
             # Получаем информацию о файле
             file_stat = os.stat(file_path)
+            follow_inode = file_stat.st_ino
             log_size = f"{file_stat.st_size / 1024:.1f} KB"
             log_update_time = datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
             
@@ -820,14 +1136,16 @@ def view_logs():
         log_content=log_content,
         log_size=log_size,
         log_update_time=log_update_time,
-        can_clear=can_clear
+        can_clear=can_clear,
+        lines=lines,
+        before=before,
+        earlier_offset=earlier_offset,
+        follow_offset=follow_offset,
+        follow_inode=follow_inode
     )
 
-@app.route('/api/get_log_files')
-def get_log_files():
-    """API для получения списка лог-файлов определенного типа"""
-    log_type = request.args.get('log_type', 'all')
-    
+def list_log_files(log_type='all'):
+    """Имена лог-файлов определенного типа, новые вначале"""
     # Определяем директорию с логами
     logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
     if not os.path.exists(logs_dir):
@@ -846,13 +1164,125 @@ def get_log_files():
     
     # Сортируем файлы по дате модификации (новые вначале)
     log_files = sorted(log_files, key=os.path.getmtime, reverse=True)
-    log_files = [os.path.basename(f) for f in log_files]
+    return [os.path.basename(f) for f in log_files]
+
+@app.route('/api/get_log_files')
+def get_log_files():
+    """API для получения списка лог-файлов определенного типа"""
+    log_type = request.args.get('log_type', 'all')
+    
+    return jsonify({
+        'success': True,
+        'files': list_log_files(log_type)
+    })
+
+# Открытый поток SSE занимает поток воркера gunicorn, поэтому их число ограничено
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def sse_response(events):
+    """SSE response holding one of the worker's stream slots; 503 when all slots are busy"""
+    if not sse_slots.acquire(blocking=False):
+        response = jsonify({'success': False, 'error': 'Слишком много открытых потоков, используйте опрос'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    
+    response = Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(sse_slots.release)
+    return response
+
+@app.route('/api/monitor/stream')
+def monitor_stream():
+    """SSE для страницы мониторинга: сначала полный снимок состояния, затем только изменения"""
+    from config import SSE_KEEPALIVE_SECONDS, SSE_MAX_DURATION
+    
+    snapshot = health_sampler.snapshot()
+    return sse_response(
+        monitor_events.stream(initial=[('health', snapshot)],
+                              keepalive=SSE_KEEPALIVE_SECONDS,
+                              max_duration=SSE_MAX_DURATION)
+    )
+
+def resolve_log_file(log_file):
+    """Путь к лог-файлу из списка доступных или None (защита от выхода за пределы папки logs)"""
+    if not log_file or log_file not in list_log_files('all'):
+        return None
+    return os.path.join(os.path.dirname(__file__), 'logs', log_file)
+
+@app.route('/api/logs/follow')
+def follow_log():
+    """
+    API для слежения за лог-файлом: строки, дописанные после смещения offset
+
+    Без offset возвращает текущий конец файла, с которого начинать следующий запрос.
+    inode из предыдущего ответа позволяет заметить, что файл заменили (ротация).
+    """
+    from config import LOG_TAIL_MAX_BYTES
+    
+    file_path = resolve_log_file(request.args.get('log_file'))
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Лог-файл не найден'}), 404
+    
+    try:
+        chunk = read_from(file_path, request.args.get('offset', type=int), LOG_TAIL_MAX_BYTES,
+                          request.args.get('inode', type=int))
+    except OSError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
     
     return jsonify({
         'success': True,
-        'files': log_files
+        'text': chunk.text,
+        'offset': chunk.offset,
+        'size': chunk.size,
+        'reset': chunk.reset,
+        'inode': chunk.inode
     })
 
+@app.route('/api/logs/stream')
+def stream_log():
+    """SSE для слежения за лог-файлом: новые строки отправляются по мере их появления"""
+    from config import LOG_FOLLOW_POLL_INTERVAL, LOG_TAIL_MAX_BYTES, SSE_KEEPALIVE_SECONDS, SSE_MAX_DURATION
+    
+    file_path = resolve_log_file(request.args.get('log_file'))
+    if file_path is None:
+        return jsonify({'success': False, 'error': 'Лог-файл не найден'}), 404
+    
+    # При переподключении браузер передает id последнего события - "inode:смещение"
+    offset = request.args.get('offset', type=int)
+    inode = request.args.get('inode', type=int)
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if last_event_id:
+        try:
+            inode, offset = (int(value) for value in last_event_id.split(':'))
+        except ValueError:
+            pass
+    
+    def generate():
+        started_at = time.time()
+        last_sent = started_at
+        yield "retry: 3000\n\n"
+        for chunk in follow(file_path, offset, LOG_FOLLOW_POLL_INTERVAL, LOG_TAIL_MAX_BYTES, inode):
+            now = time.time()
+            if now - started_at >= SSE_MAX_DURATION:
+                break
+            if chunk is not None:
+                yield f"id: {chunk.inode}:{chunk.offset}\n" + format_sse('lines', {
+                    'text': chunk.text,
+                    'offset': chunk.offset,
+                    'reset': chunk.reset,
+                    'inode': chunk.inode
+                })
+                last_sent = now
+            elif now - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = now
+    
+    return sse_response(generate())
+
 @app.route('/api/download_log')
 def download_log():
     """API для скачивания лог-файла"""
@@ -0,0 +1,112 @@
+"""
+Кэш Telegram file_id для изображений из новостей.
+
+Каждое изображение загружается в Telegram по URL только один раз: полученный
+file_id сохраняется по URL изображения и используется для всех следующих
+подписчиков и дайджестов, поэтому Telegram не скачивает картинку заново.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from db_executor import run_db
+
+logger = logging.getLogger(__name__)
+
+try:
+    from main import app, db, TelegramMedia
+    use_db = True
+
+    def load_file_ids(urls: List[str]) -> Dict[str, str]:
+        """Load known file_ids for the given image URLs from the database"""
+        with app.app_context():
+            rows = TelegramMedia.query.filter(TelegramMedia.image_url.in_(urls)).all()
+            return {row.image_url: row.file_id for row in rows}
+
+    def save_file_ids(file_ids: Dict[str, str]) -> None:
+        """Store file_ids for image URLs in the database"""
+        with app.app_context():
+            existing = {row.image_url: row for row in
+                        TelegramMedia.query.filter(TelegramMedia.image_url.in_(list(file_ids))).all()}
+            for url, file_id in file_ids.items():
+                if url in existing:
+                    existing[url].file_id = file_id
+                else:
+                    db.session.add(TelegramMedia(image_url=url, file_id=file_id))
+            db.session.commit()
+
+    def delete_file_ids(urls: List[str]) -> None:
+        """Remove stale file_ids from the database"""
+        with app.app_context():
+            TelegramMedia.query.filter(TelegramMedia.image_url.in_(urls)).delete(synchronize_session=False)
+            db.session.commit()
+except ImportError:
+    use_db = False
+
+    def load_file_ids(urls: List[str]) -> Dict[str, str]:
+        return {}
+
+    def save_file_ids(file_ids: Dict[str, str]) -> None:
+        pass
+
+    def delete_file_ids(urls: List[str]) -> None:
+        pass
+
+class MediaFileCache:
+    """Соответствие URL изображения -> Telegram file_id"""
+
+    def __init__(self):
+        self._file_ids: Dict[str, str] = {}
+
+    def get(self, url: str) -> Optional[str]:
+        """Получить file_id изображения, если оно уже загружалось"""
+        return self._file_ids.get(url)
+
+    def media_for(self, url: str) -> str:
+        """Значение для InputMediaPhoto.media: file_id если известен, иначе URL"""
+        return self._file_ids.get(url, url)
+
+    async def load(self, urls: Iterable[str]) -> None:
+        """Подгрузить из БД file_id для URL, которых еще нет в памяти"""
+        missing = [url for url in urls if url and url not in self._file_ids]
+        if not missing:
+            return
+        try:
+            self._file_ids.update(await run_db(load_file_ids, missing))
+        except Exception as e:
+            logger.error(f"Error loading cached file_ids: {e}")
+
+    async def remember(self, urls: List[str], messages) -> None:
+        """
+        Запомнить file_id из ответа send_media_group / send_photo
+
+        Args:
+            urls: URL изображений в том же порядке, в котором они отправлялись
+            messages: Сообщения, которые вернул Telegram
+        """
+        new_ids = {}
+        for url, message in zip(urls, messages or []):
+            photo = getattr(message, 'photo', None)
+            if url and photo and url not in self._file_ids:
+                # Последний размер - самый большой
+                new_ids[url] = photo[-1].file_id
+        if not new_ids:
+            return
+
+        self._file_ids.update(new_ids)
+        try:
+            await run_db(save_file_ids, new_ids)
+        except Exception as e:
+            logger.error(f"Error saving file_ids: {e}")
+
+    async def forget(self, urls: Iterable[str]) -> None:
+        """Удалить file_id, которые Telegram больше не принимает"""
+        stale = [url for url in urls if self._file_ids.pop(url, None) is not None]
+        if not stale:
+            return
+        try:
+            await run_db(delete_file_ids, stale)
+        except Exception as e:
+            logger.error(f"Error deleting file_ids: {e}")
+
+# Общий кэш процесса
+media_cache = MediaFileCache()
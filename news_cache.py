@@ -0,0 +1,73 @@
+"""
+Общий кэш новостей для бота с ограниченным временем жизни (TTL).
+
+Одновременные запросы ждут одно и то же обновление (single-flight), а запросы
+в пределах TTL получают новости прямо из памяти без обращения к сети и БД.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+NewsResult = Tuple[List[Dict[str, Any]], bool]
+
+class NewsCache:
+    """Кэш результатов get_latest_news с объединением параллельных обновлений"""
+
+    def __init__(self, loader: Callable[[int], Awaitable[NewsResult]], ttl: float):
+        """
+        Args:
+            loader: Корутина, загружающая новости: loader(max_per_feed) -> (news_items, has_errors)
+            ttl: Время жизни кэша в секундах
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._results: Dict[int, NewsResult] = {}
+        self._fetched_at: Dict[int, float] = {}
+        self._inflight: Dict[int, asyncio.Task] = {}
+
+    def _is_fresh(self, max_per_feed: int) -> bool:
+        fetched_at = self._fetched_at.get(max_per_feed)
+        return fetched_at is not None and time.monotonic() - fetched_at < self._ttl
+
+    async def _refresh(self, max_per_feed: int) -> NewsResult:
+        try:
+            news_items, has_errors = await self._loader(max_per_feed)
+            # Пустой результат не кэшируем, чтобы следующий запрос попробовал снова
+            if news_items:
+                self._results[max_per_feed] = (news_items, has_errors)
+                self._fetched_at[max_per_feed] = time.monotonic()
+            return news_items, has_errors
+        finally:
+            self._inflight.pop(max_per_feed, None)
+
+    async def get(self, max_per_feed: int, force: bool = False) -> NewsResult:
+        """
+        Получить новости из кэша или дождаться обновления
+
+        Args:
+            max_per_feed: Количество новостей с одного источника
+            force: Игнорировать TTL и обновить новости (присоединяется к уже идущему обновлению)
+
+        Returns:
+            Кортеж (news_items, has_errors); список новостей общий, изменять его нельзя
+        """
+        if not force and self._is_fresh(max_per_feed):
+            return self._results[max_per_feed]
+
+        task = self._inflight.get(max_per_feed)
+        if task is None:
+            logger.info(f"Обновление кэша новостей (news_per_source={max_per_feed})")
+            task = asyncio.create_task(self._refresh(max_per_feed))
+            self._inflight[max_per_feed] = task
+
+        # shield: отмена одного ожидающего не должна прерывать общее обновление
+        return await asyncio.shield(task)
+
+    def invalidate(self) -> None:
+        """Сбросить кэш, следующий запрос загрузит новости заново"""
+        self._results.clear()
+        self._fetched_at.clear()
+
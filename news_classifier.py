@@ -0,0 +1,219 @@
+"""
+Пакетная классификация новостей по рубрикам (NumPy).
+
+Пачка новостей превращается в разреженную матрицу частот основ слов
+(документы x словарь), а оценки всех рубрик получаются одним матричным
+произведением с весами рубрик. Веса - логарифмы вероятностей
+мультиномиального наивного байесовского классификатора, обученного на
+размеченной истории новостей (разметка - рубрикатор по ключевым словам).
+
+NumPy необязателен: без него load_classifier() возвращает None, и рубрики
+определяются по ключевым словам. SciPy, если установлен, используется для
+произведения разреженной матрицы на веса, иначе оно считается через
+np.bincount.
+"""
+import logging
+import os
+import re
+import threading
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+# Слова сокращаются до основы фиксированной длины - грубый стемминг для русского языка
+STEM_LENGTH = 6
+
+# Сколько разных слов помнить в кэше слово -> столбец матрицы
+TOKEN_CACHE_SIZE = 500000
+
+TOKEN_RE = re.compile(r'\w\w+')
+
+def stem(token: str) -> str:
+    """Основа слова (в нижнем регистре)"""
+    return token.replace('ё', 'е')[:STEM_LENGTH]
+
+def tokenize(text: str) -> List[str]:
+    """Основы слов текста"""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
+
+def news_text(item) -> str:
+    """Текст новости для классификации (словарь или объект с title и summary)"""
+    if isinstance(item, dict):
+        return (item.get('title') or '') + " " + (item.get('summary') or '')
+    return (item.title or '') + " " + (item.summary or '')
+
+class NewsClassifier:
+    """Мультиномиальный наивный байесовский классификатор рубрик"""
+
+    def __init__(self, vocabulary: Dict[str, int], categories: Sequence[str], weights, bias):
+        """
+        Args:
+            vocabulary: Основа слова -> номер столбца
+            categories: Названия рубрик (порядок строк весов)
+            weights: Матрица весов (словарь x рубрики), log P(слово | рубрика)
+            bias: Вектор log P(рубрика)
+        """
+        self.vocabulary = vocabulary
+        self.categories = list(categories)
+        self.weights = weights
+        self.bias = bias
+        # Слово целиком -> столбец (или -1): основа вычисляется один раз для каждого слова.
+        # Классифицируют и бот, и потоки веб-сервера, поэтому кэш защищен блокировкой
+        self._token_columns: Dict[str, int] = {}
+        self._token_columns_lock = threading.Lock()
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], alpha: float = 1.0,
+              min_count: int = 2) -> 'NewsClassifier':
+        """
+        Обучить классификатор на размеченных текстах
+
+        Args:
+            texts: Тексты новостей
+            labels: Рубрики новостей
+            alpha: Сглаживание Лапласа
+            min_count: Основы, встретившиеся реже, в словарь не попадают
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required to train the news classifier")
+
+        tokenized = [tokenize(text) for text in texts]
+        counts: Dict[str, int] = {}
+        for tokens in tokenized:
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+        vocabulary = {token: index for index, token in
+                      enumerate(sorted(token for token, count in counts.items() if count >= min_count))}
+
+        categories = sorted(set(labels))
+        category_index = {category: index for index, category in enumerate(categories)}
+        label_ids = np.array([category_index[label] for label in labels], dtype=np.intp)
+
+        matrix = _stem_count_matrix(tokenized, vocabulary)
+        # Частоты основ по рубрикам: (рубрики x словарь)
+        term_counts = np.zeros((len(categories), len(vocabulary)))
+        np.add.at(term_counts, (label_ids[matrix['rows']], matrix['cols']), matrix['values'])
+
+        smoothed = term_counts + alpha
+        weights = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).T
+        bias = np.log(np.bincount(label_ids, minlength=len(categories)) / len(labels))
+        return cls(vocabulary, categories, np.ascontiguousarray(weights), bias)
+
+    def count_matrix(self, texts: Sequence[str]) -> Dict[str, 'np.ndarray']:
+        """
+        Разреженная матрица частот основ для пачки текстов (формат COO)
+
+        Повторы одной основы в тексте не складываются здесь - они суммируются
+        при умножении на веса.
+        """
+        token_lists = [TOKEN_RE.findall(text.lower()) for text in texts]
+        tokens = list(chain.from_iterable(token_lists))
+
+        with self._token_columns_lock:
+            columns = self._token_columns
+            unseen = set(tokens).difference(columns)
+            if unseen:
+                if len(columns) + len(unseen) > TOKEN_CACHE_SIZE:
+                    columns.clear()
+                    unseen = set(tokens)
+                for token in unseen:
+                    columns[token] = self.vocabulary.get(stem(token), -1)
+            cols = np.fromiter(map(columns.__getitem__, tokens), dtype=np.intp, count=len(tokens))
+        lengths = np.fromiter(map(len, token_lists), dtype=np.intp, count=len(token_lists))
+        rows = np.repeat(np.arange(len(texts), dtype=np.intp), lengths)
+        known = cols >= 0
+        return {
+            'rows': rows[known],
+            'cols': cols[known],
+            'values': np.ones(int(known.sum()))
+        }
+
+    def scores(self, texts: Sequence[str]):
+        """Оценки рубрик для пачки текстов: матрица (тексты x рубрики)"""
+        matrix = self.count_matrix(texts)
+        count = len(texts)
+        if sparse is not None:
+            counts = sparse.csr_matrix((matrix['values'], (matrix['rows'], matrix['cols'])),
+                                       shape=(count, len(self.vocabulary)))
+            return np.asarray(counts @ self.weights) + self.bias
+
+        result = np.empty((count, len(self.categories)))
+        for column in range(len(self.categories)):
+            contributions = matrix['values'] * self.weights[matrix['cols'], column]
+            result[:, column] = np.bincount(matrix['rows'], weights=contributions, minlength=count)
+        return result + self.bias
+
+    def predict(self, texts: Sequence[str]) -> List[str]:
+        """Рубрики для пачки текстов"""
+        if not texts:
+            return []
+        best = self.scores(texts).argmax(axis=1)
+        return [self.categories[index] for index in best]
+
+    def save(self, path: str) -> None:
+        """Сохранить модель в файл .npz"""
+        tokens = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, tokens=np.array(tokens), categories=np.array(self.categories),
+                                weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> 'NewsClassifier':
+        """Загрузить модель из файла .npz"""
+        with np.load(path) as data:
+            vocabulary = {str(token): index for index, token in enumerate(data['tokens'])}
+            return cls(vocabulary, [str(category) for category in data['categories']],
+                       data['weights'], data['bias'])
+
+def _stem_count_matrix(tokenized: Sequence[Sequence[str]], vocabulary: Dict[str, int]) -> Dict[str, 'np.ndarray']:
+    """Разреженная матрица частот по уже выделенным основам (для обучения)"""
+    rows = []
+    cols = []
+    for row, tokens in enumerate(tokenized):
+        ids = [vocabulary[token] for token in tokens if token in vocabulary]
+        rows.extend([row] * len(ids))
+        cols.extend(ids)
+    return {
+        'rows': np.array(rows, dtype=np.intp),
+        'cols': np.array(cols, dtype=np.intp),
+        'values': np.ones(len(cols))
+    }
+
+_classifier: Optional[NewsClassifier] = None
+_classifier_mtime: Optional[float] = None
+
+def load_classifier(path: str) -> Optional[NewsClassifier]:
+    """
+    Обученная модель из файла (перечитывается только при изменении файла)
+
+    Returns:
+        Классификатор или None, если NumPy не установлен или модель еще не обучена
+    """
+    global _classifier, _classifier_mtime
+    if np is None:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _classifier is None or mtime != _classifier_mtime:
+        try:
+            _classifier = NewsClassifier.load(path)
+            _classifier_mtime = mtime
+            logger.info(f"News classifier loaded: {len(_classifier.vocabulary)} terms, "
+                        f"{len(_classifier.categories)} categories")
+        except Exception as e:
+            logger.error(f"Error loading news classifier from {path}: {e}")
+            return None
+    return _classifier
@@ -0,0 +1,167 @@
+"""
+Склейка одинаковых новостей из разных источников (MinHash LSH).
+
+Для каждой новости строится подпись MinHash по множеству основ слов
+заголовка и описания. Подписи недавних новостей хранятся в скользящем
+индексе LSH: подпись делится на полосы, и кандидаты в дубликаты ищутся
+только в корзинах с совпадающей полосой, поэтому поиск не зависит от числа
+новостей в индексе. Кандидат считается дубликатом, если оценка сходства
+Жаккара не ниже порога.
+
+Из каждой группы дубликатов остается одна новость, а остальные источники
+перечисляются в поле also_in ("также в: ...").
+"""
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from news_classifier import news_text, tokenize
+
+# Простое число Мерсенна 2^61 - 1 для хеш-функций вида (a*x + b) mod p
+_PRIME = (1 << 61) - 1
+
+# Основы короче этой длины (предлоги, союзы) не участвуют в сравнении
+MIN_STEM_LENGTH = 3
+
+# Сколько основ хранить в кэше хешей
+STEM_CACHE_SIZE = 200000
+
+Signature = Tuple[int, ...]
+
+class NewsDeduplicator:
+    """Скользящий индекс MinHash LSH недавних новостей"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.5,
+                 max_age: float = 48 * 3600, max_size: int = 20000, seed: int = 1):
+        """
+        Args:
+            num_perm: Длина подписи MinHash
+            bands: Число полос LSH (num_perm должно делиться на bands)
+            threshold: Минимальная оценка сходства Жаккара для дубликата
+            max_age: Сколько секунд новость остается в индексе
+            max_size: Максимальное число новостей в индексе (старые вытесняются)
+            seed: Зерно для коэффициентов хеш-функций
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self._rows = num_perm // bands
+        self._bands = bands
+        self._max_age = max_age
+        self._max_size = max_size
+        rng = random.Random(seed)
+        self._coefficients = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        # Основа -> ее значения всех хеш-функций: подпись текста - поэлементный минимум по основам
+        self._stem_hashes: Dict[str, Tuple[int, ...]] = {}
+
+        # Ключ группы -> (подпись, время последнего появления); порядок - от старых к новым
+        self._entries: 'OrderedDict[str, Tuple[Signature, float]]' = OrderedDict()
+        self._buckets: List[Dict[Signature, set]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> Optional[Signature]:
+        """Подпись MinHash текста (None, если в тексте нет значимых слов)"""
+        stems = {token for token in tokenize(text) if len(token) >= MIN_STEM_LENGTH}
+        if not stems:
+            return None
+        return tuple(map(min, zip(*(self._hashes(stem) for stem in stems))))
+
+    def _hashes(self, stem: str) -> Tuple[int, ...]:
+        values = self._stem_hashes.get(stem)
+        if values is None:
+            base = zlib.crc32(stem.encode('utf-8'))
+            values = tuple((a * base + b) % _PRIME for a, b in self._coefficients)
+            if len(self._stem_hashes) >= STEM_CACHE_SIZE:
+                self._stem_hashes.clear()
+            self._stem_hashes[stem] = values
+        return values
+
+    def _band_keys(self, signature: Signature):
+        for band in range(self._bands):
+            yield band, signature[band * self._rows:(band + 1) * self._rows]
+
+    @staticmethod
+    def similarity(first: Signature, second: Signature) -> float:
+        """Оценка сходства Жаккара по двум подписям"""
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    def _find(self, signature: Signature) -> Optional[str]:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_key = None
+        best_similarity = self.threshold
+        for candidate in candidates:
+            similarity = self.similarity(signature, self._entries[candidate][0])
+            if similarity >= best_similarity:
+                best_key = candidate
+                best_similarity = similarity
+        return best_key
+
+    def _add(self, key: str, signature: Signature, now: float) -> None:
+        if key in self._entries:
+            # Группа снова встретилась - продлеваем ее жизнь в индексе
+            self._entries[key] = (self._entries[key][0], now)
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = (signature, now)
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def _remove_oldest(self) -> None:
+        key, (signature, _) = self._entries.popitem(last=False)
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            oldest_seen = next(iter(self._entries.values()))[1]
+            if len(self._entries) <= self._max_size and now - oldest_seen < self._max_age:
+                break
+            self._remove_oldest()
+
+    def deduplicate(self, news_items: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Оставить по одной новости из каждой группы дубликатов
+
+        Порядок новостей сохраняется. Если группа уже была в индексе, остается
+        новость, открывшая группу (при ее наличии в списке), иначе первая.
+        Источники остальных новостей группы добавляются в поле also_in
+        (список словарей с source и link), одинаковые источники не повторяются.
+        """
+        now = time.time()
+        groups: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        with self._lock:
+            self._expire(now)
+            for item in news_items:
+                key = item.get('link') or item.get('title', '')
+                signature = self.signature(news_text(item))
+                if signature is not None:
+                    key = self._find(signature) or key
+                    self._add(key, signature, now)
+                groups.setdefault(key, []).append(item)
+
+        result = []
+        for key, items in groups.items():
+            representative = next((item for item in items if item.get('link') == key), items[0])
+            seen_sources = {representative.get('source')}
+            also_in = []
+            for item in items:
+                if item.get('source') not in seen_sources:
+                    seen_sources.add(item.get('source'))
+                    also_in.append({'source': item.get('source'), 'link': item.get('link')})
+            if also_in:
+                representative = dict(representative, also_in=also_in)
+            result.append(representative)
+        return result
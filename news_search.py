@@ -0,0 +1,124 @@
+"""
+Полнотекстовый поиск по сохраненным новостям.
+
+SQLite: таблица FTS5 news_items_fts по заголовку и описанию, связанная с
+news_items (external content) и обновляемая триггерами, поэтому upsert
+новостей ничего не знает о поиске. PostgreSQL: вычисляемая колонка
+search_vector (tsvector) с индексом GIN. В обоих случаях отбор и
+ранжирование выполняются по индексу, и время ответа зависит от числа
+совпадений, а не от общего числа новостей.
+"""
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+# Конфигурация текстового поиска PostgreSQL (стемминг для русского языка)
+POSTGRES_TEXT_CONFIG = 'russian'
+
+def _sqlite_normalized(column: str) -> str:
+    """Выражение SQLite для индексируемого текста (токенизатор unicode61 не считает ё вариантом е)"""
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+_SQLITE_NEW = f"{_sqlite_normalized('new.title')}, {_sqlite_normalized('new.summary')}"
+_SQLITE_OLD = f"{_sqlite_normalized('old.title')}, {_sqlite_normalized('old.summary')}"
+
+SQLITE_SETUP_SQL = [
+    # Индекс префиксов ускоряет поиск по началу слова (русские слова ищутся без окончаний)
+    "CREATE VIRTUAL TABLE IF NOT EXISTS news_items_fts USING fts5("
+    "title, summary, content='news_items', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS news_items_fts_ai AFTER INSERT ON news_items BEGIN "
+    f"INSERT INTO news_items_fts(rowid, title, summary) VALUES (new.id, {_SQLITE_NEW}); "
+    "END",
+    # Для удаления из external content индекса нужны те же значения, что были проиндексированы
+    "CREATE TRIGGER IF NOT EXISTS news_items_fts_ad AFTER DELETE ON news_items BEGIN "
+    f"INSERT INTO news_items_fts(news_items_fts, rowid, title, summary) VALUES ('delete', old.id, {_SQLITE_OLD}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS news_items_fts_au AFTER UPDATE OF title, summary ON news_items BEGIN "
+    f"INSERT INTO news_items_fts(news_items_fts, rowid, title, summary) VALUES ('delete', old.id, {_SQLITE_OLD}); "
+    f"INSERT INTO news_items_fts(rowid, title, summary) VALUES (new.id, {_SQLITE_NEW}); "
+    "END",
+    # Совпадение в заголовке весит вдвое больше, чем в описании
+    "INSERT INTO news_items_fts(news_items_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')",
+]
+
+# Заполнение индекса уже сохраненными новостями (вместо 'rebuild', который не знает о замене ё)
+SQLITE_FILL_SQL = (
+    "INSERT INTO news_items_fts(rowid, title, summary) "
+    f"SELECT id, {_sqlite_normalized('title')}, {_sqlite_normalized('summary')} FROM news_items"
+)
+
+POSTGRES_SETUP_SQL = [
+    "ALTER TABLE news_items ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{POSTGRES_TEXT_CONFIG}', translate(coalesce(title, ''), 'ёЁ', 'еЕ')), 'A') || "
+    f"setweight(to_tsvector('{POSTGRES_TEXT_CONFIG}', translate(coalesce(summary, ''), 'ёЁ', 'еЕ')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS ix_news_items_search ON news_items USING GIN (search_vector)",
+]
+
+def setup_search_index(engine) -> None:
+    """
+    Создать поисковый индекс новостей, если его еще нет
+
+    При первом создании индекс FTS5 заполняется уже сохраненными новостями.
+    Для остальных СУБД ничего не делает.
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as connection:
+        if dialect == 'sqlite':
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_items_fts'"
+            )).first() is not None
+            for statement in SQLITE_SETUP_SQL:
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text(SQLITE_FILL_SQL))
+                print("Создан полнотекстовый индекс news_items_fts")
+        elif dialect == 'postgresql':
+            for statement in POSTGRES_SETUP_SQL:
+                connection.execute(text(statement))
+
+def search_terms(query: str) -> List[str]:
+    """Слова поискового запроса (без знаков препинания и операторов)"""
+    return re.findall(r'\w+', query.lower().replace('ё', 'е'))
+
+def search_news_ids(session, query: str, limit: int) -> List[Tuple[int, float]]:
+    """
+    Найти новости по словам запроса
+
+    Ищутся новости, содержащие все слова запроса (в SQLite - как начало слова,
+    в PostgreSQL - с учетом словоформ).
+
+    Args:
+        session: Сессия SQLAlchemy
+        query: Текст запроса пользователя
+        limit: Максимальное число результатов
+
+    Returns:
+        Список (id новости, оценка релевантности), самые релевантные вначале
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # Каждое слово в кавычках, чтобы ввод пользователя не разбирался как синтаксис FTS5
+        match = ' '.join(f'"{term}"*' for term in terms)
+        rows = session.execute(text(
+            "SELECT rowid, rank FROM news_items_fts WHERE news_items_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit"
+        ), {'match': match, 'limit': limit})
+        # bm25 в FTS5 отрицательный: чем меньше, тем релевантнее
+        return [(row[0], -row[1]) for row in rows]
+
+    if dialect == 'postgresql':
+        rows = session.execute(text(
+            "SELECT id, ts_rank_cd(search_vector, query) AS rank "
+            f"FROM news_items, plainto_tsquery('{POSTGRES_TEXT_CONFIG}', :query) AS query "
+            "WHERE search_vector @@ query ORDER BY rank DESC, id DESC LIMIT :limit"
+        ), {'query': ' '.join(terms), 'limit': limit})
+        return [(row[0], row[1]) for row in rows]
+
+    raise RuntimeError(f"Full-text search is not supported for database dialect {dialect}")
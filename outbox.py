@@ -0,0 +1,225 @@
+"""
+Постоянная очередь (outbox) рассылок новостей.
+
+Каждая рассылка по расписанию - это строка Digest с заранее собранным
+содержимым (части сообщения, медиа и хэш содержимого), а каждая
+доставка подписчику - строка OutboxMessage со статусом. После перезапуска бот
+продолжает рассылку с того места, где остановился, не отправляя дайджест
+повторно тем, кто его уже получил.
+
+Дайджест хранит короткие хэши ссылок своих новостей (link_hashes): по ним
+следующий дайджест отбрасывает уже разосланные новости, а если новых нет,
+слот отмечается как пропущенный ('skipped').
+
+Неудачные доставки ('failed') повторяются, пока не исчерпано число попыток.
+Прерванная рассылка, слот которой старше окна допуска планировщика, после
+перезапуска не досылается, а закрывается со статусом 'expired'.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, insert, or_, update
+
+from main import app, db, Digest, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+def get_digest(slot_key: str) -> Optional[Dict[str, Any]]:
+    """Получить дайджест слота рассылки (если он уже собран или разослан)"""
+    with app.app_context():
+        digest = Digest.query.filter_by(slot_key=slot_key).first()
+        if not digest:
+            return None
+        return {
+            'id': digest.id,
+            'slot_key': digest.slot_key,
+            'status': digest.status,
+            'payload': digest.payload,
+            'content_hash': digest.content_hash,
+            'link_hashes': digest.link_hashes
+        }
+
+def get_delivered_link_hashes(since: datetime) -> Set[str]:
+    """
+    Хэши ссылок новостей из дайджестов, разосланных начиная с since
+
+    Учитываются и дайджесты, рассылка которых еще идет или прервана перезапуском:
+    их новости подписчики уже получают, а недосланное будет дослано.
+    """
+    with app.app_context():
+        rows = (db.session.query(Digest.link_hashes)
+                .filter(or_(and_(Digest.status == 'done', Digest.completed_at >= since),
+                            and_(Digest.status == 'sending', Digest.created_at >= since)))
+                .all())
+        return {value for row in rows for value in (row.link_hashes or ())}
+
+def save_prebuilt_digest(slot_key: str, payload: Dict[str, Any], content_hash: str,
+                         link_hashes: Optional[List[str]] = None) -> bool:
+    """
+    Сохранить заранее собранный дайджест (статус 'ready')
+
+    Returns:
+        False, если рассылка для слота уже началась и дайджест менять нельзя
+    """
+    with app.app_context():
+        digest = Digest.query.filter_by(slot_key=slot_key).first()
+        if digest and digest.status != 'ready':
+            return False
+        if not digest:
+            digest = Digest(slot_key=slot_key)
+            db.session.add(digest)
+        digest.status = 'ready'
+        digest.payload = payload
+        digest.content_hash = content_hash
+        digest.link_hashes = link_hashes
+        db.session.commit()
+        logger.info(f"Prebuilt digest {slot_key} ({content_hash[:12]})")
+        return True
+
+def start_digest(slot_key: str, payload: Dict[str, Any], content_hash: str, user_ids: List[int],
+                 link_hashes: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Начать рассылку: создать строки очереди для всех подписчиков одной транзакцией
+
+    Если дайджест слота был собран заранее, используется он, а переданный
+    payload игнорируется.
+
+    Returns:
+        {'id': ..., 'payload': ...} или None, если рассылка для этого слота уже начиналась
+    """
+    with app.app_context():
+        digest = Digest.query.filter_by(slot_key=slot_key).first()
+        if digest and digest.status != 'ready':
+            return None
+        if not digest:
+            digest = Digest(slot_key=slot_key, payload=payload, content_hash=content_hash,
+                            link_hashes=link_hashes)
+            db.session.add(digest)
+        digest.status = 'sending'
+        db.session.flush()
+
+        if user_ids:
+            db.session.execute(
+                insert(OutboxMessage),
+                [{'digest_id': digest.id, 'user_id': user_id, 'status': 'pending'} for user_id in user_ids]
+            )
+        db.session.commit()
+        logger.info(f"Started digest {slot_key} for {len(user_ids)} subscribers")
+        return {'id': digest.id, 'payload': digest.payload}
+
+def skip_digest(slot_key: str) -> bool:
+    """
+    Отметить слот как пропущенный: с прошлой рассылки не появилось новых новостей
+
+    Returns:
+        False, если рассылка для слота уже началась
+    """
+    with app.app_context():
+        digest = Digest.query.filter_by(slot_key=slot_key).first()
+        if digest and digest.status != 'ready':
+            return False
+        if not digest:
+            digest = Digest(slot_key=slot_key)
+            db.session.add(digest)
+        digest.status = 'skipped'
+        digest.payload = None
+        digest.content_hash = None
+        digest.link_hashes = None
+        digest.completed_at = datetime.now()
+        db.session.commit()
+        logger.info(f"Skipped digest {slot_key}: no new news")
+        return True
+
+def get_unfinished_digests() -> List[Dict[str, Any]]:
+    """Получить дайджесты, рассылка которых не была завершена"""
+    with app.app_context():
+        digests = Digest.query.filter_by(status='sending').order_by(Digest.id).all()
+        return [{'id': d.id, 'slot_key': d.slot_key, 'payload': d.payload} for d in digests]
+
+def get_pending_recipients(digest_id: int, limit: int) -> List[int]:
+    """Получить следующую порцию подписчиков, которым дайджест еще не отправлен"""
+    with app.app_context():
+        rows = (db.session.query(OutboxMessage.user_id)
+                .filter_by(digest_id=digest_id, status='pending')
+                .order_by(OutboxMessage.id)
+                .limit(limit)
+                .all())
+        return [row.user_id for row in rows]
+
+def save_results(digest_id: int, results: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Сохранить результаты доставки порции
+
+    Args:
+        results: {user_id: {'status': 'sent' | 'blocked' | 'failed', 'error': str | None}}
+    """
+    if not results:
+        return
+
+    attempts = func.coalesce(OutboxMessage.attempts, 0) + 1
+    with app.app_context():
+        by_status: Dict[str, List[int]] = {}
+        for user_id, result in results.items():
+            if result.get('error'):
+                db.session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.digest_id == digest_id, OutboxMessage.user_id == user_id)
+                    .values(status=result['status'], error=result['error'][:500], attempts=attempts)
+                )
+            else:
+                by_status.setdefault(result['status'], []).append(user_id)
+
+        for status, user_ids in by_status.items():
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.digest_id == digest_id, OutboxMessage.user_id.in_(user_ids))
+                .values(status=status, attempts=attempts)
+            )
+        db.session.commit()
+
+def retry_failed(digest_id: int, max_attempts: int) -> int:
+    """
+    Вернуть в очередь неудачные доставки, у которых остались попытки
+
+    Returns:
+        Количество доставок, возвращенных в очередь
+    """
+    with app.app_context():
+        result = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.digest_id == digest_id, OutboxMessage.status == 'failed',
+                   func.coalesce(OutboxMessage.attempts, 0) < max_attempts)
+            .values(status='pending')
+        )
+        db.session.commit()
+        return result.rowcount or 0
+
+def expire_digest(digest_id: int) -> int:
+    """
+    Закрыть устаревшую рассылку, не досылая ее
+
+    Returns:
+        Количество недоставленных сообщений, отмеченных как 'expired'
+    """
+    with app.app_context():
+        result = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.digest_id == digest_id, OutboxMessage.status == 'pending')
+            .values(status='expired')
+        )
+        digest = db.session.get(Digest, digest_id)
+        if digest:
+            digest.status = 'expired'
+            digest.completed_at = datetime.now()
+        db.session.commit()
+        return result.rowcount or 0
+
+def finish_digest(digest_id: int) -> None:
+    """Отметить дайджест как полностью разосланный"""
+    with app.app_context():
+        digest = db.session.get(Digest, digest_id)
+        if digest:
+            digest.status = 'done'
+            digest.completed_at = datetime.now()
+            db.session.commit()
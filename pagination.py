@@ -0,0 +1,87 @@
+"""
+Постраничный вывод по ключу (keyset pagination) для страниц и JSON API.
+
+Вместо OFFSET следующая страница выбирается условием "ключ больше/меньше
+последнего показанного", поэтому запрос идет по индексу и стоит одинаково
+для первой и для тысячной страницы. Курсор - непрозрачная строка
+(base64 от JSON со значениями ключа последней строки).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+def parse_limit(value: Optional[int]) -> int:
+    """Размер страницы из параметра запроса с ограничением сверху"""
+    if not value or value < 1:
+        return PAGE_SIZE_DEFAULT
+    return min(value, PAGE_SIZE_MAX)
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Закодировать значения ключа в курсор"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, key_columns: Sequence[Any]) -> List[Any]:
+    """
+    Раскодировать курсор в значения ключа
+
+    Raises:
+        ValueError: Если курсор поврежден или не подходит к ключу
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise ValueError("Invalid cursor: key mismatch")
+
+    result = []
+    for column, value in zip(key_columns, values):
+        if value is not None and column.type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        result.append(value)
+    return result
+
+def paginate(query, key_columns: Sequence[Any], limit: int, cursor: Optional[str] = None,
+             descending: bool = False) -> Tuple[List[Any], Optional[str]]:
+    """
+    Получить одну страницу запроса
+
+    Args:
+        query: Запрос SQLAlchemy (без ORDER BY и LIMIT)
+        key_columns: Колонки уникального ключа сортировки, например (id,); значения
+                     должны сравниваться в БД так же, как в Python (даты в SQLite
+                     хранятся строками разного формата и для ключа не годятся)
+        limit: Размер страницы
+        cursor: Курсор предыдущей страницы или None для первой
+        descending: Сортировка по убыванию ключа
+
+    Returns:
+        Кортеж (строки страницы, курсор следующей страницы или None)
+
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    key = tuple_(*key_columns) if len(key_columns) > 1 else key_columns[0]
+    if cursor:
+        values = decode_cursor(cursor, key_columns)
+        bound = tuple_(*values) if len(values) > 1 else values[0]
+        query = query.filter(key < bound if descending else key > bound)
+
+    order = [column.desc() if descending else column.asc() for column in key_columns]
+    # Одна лишняя строка показывает, есть ли следующая страница
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in key_columns])
+    return rows, next_cursor
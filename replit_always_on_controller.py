@@ -111,7 +111,7 @@ def start_web_server():
     try:
         logger.info("Запуск веб-сервера Flask...")
         port = os.environ.get("PORT", "5000")
-        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "main:app"]
+        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "--threads", "8", "main:app"]
         logger.info(f"Команда: {' '.join(cmd)}")
         
         web_log_file = open("logs/web_server.log", "a")
@@ -15,7 +15,7 @@ BOT_LOG="logs/bot_${TIMESTAMP}.log"
 
 # Запускаем веб-сервер в фоновом режиме
 echo "Запуск веб-сервера на порту 5000..."
-gunicorn --bind 0.0.0.0:5000 --workers 2 main:app > "$WEB_LOG" 2>&1 &
+gunicorn --bind 0.0.0.0:5000 --workers 2 --threads 8 main:app > "$WEB_LOG" 2>&1 &
 WEB_PID=$!
 
 # Небольшая пауза для запуска веб-сервера
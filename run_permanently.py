@@ -111,7 +111,7 @@ def start_web_server():
         web_log_file = open(web_log_path, 'w')
         
         # Команда запуска с увеличенным timeout
-        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "--timeout", "600", "main:app"]
+        cmd = ["gunicorn", "--bind", f"0.0.0.0:{port}", "--workers", "2", "--threads", "8", "--timeout", "600", "main:app"]
         logger.info(f"Команда запуска: {' '.join(cmd)}")
         
         # Запускаем процесс без захвата вывода - это важно для Replit
@@ -50,10 +50,10 @@ async def check_moscow_time():
             logger.info(f"UTC: {utc_now.strftime('%Y-%m-%d %H:%M:%S')}")
             logger.info(f"Москва (расчет): {moscow_calc.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Проверяем активные времена рассылки из базы данных
+            # Проверяем времена рассылки, загруженные планировщиком (без запроса к БД)
             try:
-                from bot import get_all_send_times
-                send_times = get_all_send_times()
+                from bot import send_scheduler
+                send_times = send_scheduler.send_times
                 time_strings = [t.strftime('%H:%M') for t in send_times]
                 logger.info(f"Настроенные времена рассылки: {', '.join(time_strings)}")
                 
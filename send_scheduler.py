@@ -0,0 +1,164 @@
+"""
+Планировщик рассылок на основе очереди с приоритетом.
+
+Вместо проверки каждую минуту планировщик вычисляет точное время следующего
+события (сборка дайджеста или рассылка) по московскому времени и спит до
+него. Расписание перечитывается только при его изменении (или раз в
+SCHEDULER_MAX_SLEEP секунд на случай изменения из другого процесса).
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+try:
+    import pytz
+    MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+    def moscow_now() -> datetime:
+        """Текущее время по Москве"""
+        return datetime.now(pytz.UTC).astimezone(MOSCOW_TZ)
+
+    def moscow_datetime(day, send_time: time) -> datetime:
+        """Момент времени send_time в день day по Москве"""
+        return MOSCOW_TZ.localize(datetime.combine(day, send_time))
+except ImportError:
+    # Если pytz не установлен, используем фиксированное смещение UTC+3
+    def moscow_now() -> datetime:
+        """Текущее время по Москве"""
+        return datetime.utcnow() + timedelta(hours=3)
+
+    def moscow_datetime(day, send_time: time) -> datetime:
+        """Момент времени send_time в день day по Москве"""
+        return datetime.combine(day, send_time)
+
+logger = logging.getLogger(__name__)
+
+# Тип события: (время срабатывания, вид события, ключ слота, время рассылки)
+Event = Tuple[datetime, str, str, datetime]
+
+PREBUILD = 'prebuild'
+SEND = 'send'
+
+class SendScheduler:
+    """Очередь ближайших событий рассылки с пробуждением при изменении расписания"""
+
+    def __init__(self,
+                 load_send_times: Callable[[], List[time]],
+                 on_prebuild: Callable[[str, datetime], Awaitable[None]],
+                 on_send: Callable[[str], Awaitable[None]],
+                 prebuild_minutes: int,
+                 grace_minutes: int,
+                 max_sleep: float):
+        """
+        Args:
+            load_send_times: Синхронная функция чтения расписания (выполняется в отдельном потоке)
+            on_prebuild: Корутина сборки дайджеста: on_prebuild(slot_key, send_at)
+            on_send: Корутина рассылки: on_send(slot_key)
+            prebuild_minutes: За сколько минут до рассылки собирать дайджест
+            grace_minutes: Сколько минут после пропущенного времени рассылки ее еще можно выполнить
+            max_sleep: Максимальное время сна до повторного чтения расписания (секунды)
+        """
+        self._load_send_times = load_send_times
+        self._on_prebuild = on_prebuild
+        self._on_send = on_send
+        self._prebuild = timedelta(minutes=prebuild_minutes)
+        self._grace = timedelta(minutes=grace_minutes)
+        self._max_sleep = max_sleep
+        self._fired: Set[Tuple[str, str]] = set()
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Запущенные сборки дайджестов: ссылки не дают сборщику мусора остановить задачу
+        self._tasks: Set[asyncio.Task] = set()
+        self.send_times: List[time] = []
+
+    def notify_changed(self) -> None:
+        """Разбудить планировщик, чтобы он перечитал расписание (из любого потока)"""
+        if self._loop is None or self._changed is None:
+            return
+        self._loop.call_soon_threadsafe(self._changed.set)
+
+    def _build_queue(self, now: datetime) -> List[Event]:
+        """Построить очередь ближайших событий для каждого времени рассылки"""
+        queue: List[Event] = []
+        for send_time in self.send_times:
+            for day in (now.date() - timedelta(days=1), now.date(), now.date() + timedelta(days=1)):
+                send_at = moscow_datetime(day, send_time)
+                slot_key = f"{day}_{send_time.strftime('%H:%M')}"
+
+                # Пропущенные рассылки выполняем, только если опоздали не больше grace
+                if send_at + self._grace < now:
+                    continue
+
+                if (SEND, slot_key) not in self._fired:
+                    heapq.heappush(queue, (send_at, SEND, slot_key, send_at))
+                prebuild_at = send_at - self._prebuild
+                if (PREBUILD, slot_key) not in self._fired and now < send_at:
+                    heapq.heappush(queue, (prebuild_at, PREBUILD, slot_key, send_at))
+        return queue
+
+    def _forget_old(self, now: datetime) -> None:
+        """Удалить отметки о выполненных событиях старше двух дней"""
+        cutoff = str(now.date() - timedelta(days=2))
+        self._fired = {(kind, key) for kind, key in self._fired if key.split('_')[0] >= cutoff}
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Спать до seconds секунд; True, если разбудили из-за изменения расписания"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        """Убрать завершенную задачу сборки и записать в лог ее ошибку"""
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error in digest prebuild task: {task.exception()}", exc_info=task.exception())
+
+    async def run(self) -> None:
+        """Основной цикл планировщика"""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        reload = True
+        loaded_at = 0.0
+
+        while True:
+            try:
+                if reload:
+                    self._changed.clear()
+                    self.send_times = await asyncio.to_thread(self._load_send_times)
+                    loaded_at = self._loop.time()
+                    reload = False
+
+                now = moscow_now()
+                self._forget_old(now)
+                queue = self._build_queue(now)
+
+                if queue:
+                    fire_at, kind, slot_key, send_at = queue[0]
+                    delay = (fire_at - now).total_seconds()
+                else:
+                    delay = self._max_sleep
+
+                if delay > 0:
+                    if queue:
+                        logger.info(f"Next scheduler event: {kind} {slot_key} at {fire_at.strftime('%Y-%m-%d %H:%M:%S')} "
+                                    f"(in {int(delay)}s)")
+                    # Спим до события, но просыпаемся при изменении расписания
+                    changed = await self._sleep(min(delay, self._max_sleep))
+                    reload = changed or self._loop.time() - loaded_at >= self._max_sleep
+                    continue
+
+                self._fired.add((kind, slot_key))
+                if kind == PREBUILD:
+                    task = asyncio.create_task(self._on_prebuild(slot_key, send_at))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._task_done)
+                else:
+                    logger.info(f"!!! Scheduled news delivery triggered for slot {slot_key} !!!")
+                    await self._on_send(slot_key)
+            except Exception as e:
+                logger.error(f"Error in scheduler: {e}", exc_info=True)
+                await asyncio.sleep(60)
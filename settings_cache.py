@@ -0,0 +1,87 @@
+"""
+Кэш настроек бота (BotSettings, активные SendTime и id администраторов) в памяти процесса.
+
+Обработчики читают настройки без обращения к БД. Снимок загружается один раз
+при запуске, до старта event loop. Кэш обновляется сразу, когда веб-интерфейс
+меняет настройки в этом же процессе (reload), а изменения из другого процесса
+замечает по счетчику версии в bot_settings, который раз в SETTINGS_CACHE_TTL
+секунд проверяется в пуле потоков БД (run_db).
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from db_executor import run_db
+
+logger = logging.getLogger(__name__)
+
+class SettingsCache:
+    """Снимок настроек бота с обновлением по версии"""
+
+    def __init__(self,
+                 load_settings: Callable[[], Dict[str, Any]],
+                 load_version: Callable[[], int],
+                 defaults: Dict[str, Any],
+                 ttl: float):
+        """
+        Args:
+            load_settings: Синхронная функция чтения настроек; результат содержит ключ 'version'
+            load_version: Синхронная функция чтения только счетчика версии
+            defaults: Настройки на случай, если БД недоступна при первом чтении
+            ttl: Как часто проверять версию настроек в БД (секунды)
+        """
+        self._load_settings = load_settings
+        self._load_version = load_version
+        self._defaults = defaults
+        self._ttl = ttl
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Вызывать callback() после каждого изменения настроек (из любого потока)"""
+        self._listeners.append(callback)
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Текущий снимок настроек (читать, но не изменять)
+
+        Никогда не обращается к БД: пока снимок не загружен, возвращает
+        настройки по умолчанию.
+        """
+        return self._snapshot or self._defaults
+
+    def reload(self) -> None:
+        """Перечитать настройки из БД (синхронно, не вызывать из event loop)"""
+        with self._lock:
+            try:
+                snapshot = self._load_settings()
+            except Exception as e:
+                logger.error(f"Error loading bot settings: {e}")
+                return
+            changed = self._snapshot is not None and snapshot != self._snapshot
+            self._snapshot = snapshot
+
+        if changed:
+            logger.info(f"Bot settings reloaded (version {snapshot.get('version')})")
+            for callback in self._listeners:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Error in settings listener: {e}")
+
+    async def refresh(self) -> None:
+        """Перечитать настройки из БД в пуле потоков, не блокируя event loop"""
+        await run_db(self.reload)
+
+    async def watch(self) -> None:
+        """Периодически сверять версию настроек с БД и перечитывать их при изменении"""
+        while True:
+            await asyncio.sleep(self._ttl)
+            try:
+                version = await run_db(self._load_version)
+                if self._snapshot is None or version != self._snapshot.get('version'):
+                    await self.refresh()
+            except Exception as e:
+                logger.error(f"Error checking bot settings version: {e}")
@@ -0,0 +1,22 @@
+"""
+Сессия бота: пул соединений к Telegram API получает лимиты из общих настроек.
+"""
+import asyncio
+
+from config import BROADCAST_WORKERS, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST
+from http_client import create_bot_session
+
+def test_bot_session_connector_uses_pool_settings():
+    async def connector_limits():
+        session = create_bot_session()
+        try:
+            client = await session.create_session()
+            # Повторный вызов возвращает тот же пул
+            assert await session.create_session() is client
+            return client.connector.limit, client.connector.limit_per_host
+        finally:
+            await session.close()
+
+    limit, limit_per_host = asyncio.run(connector_limits())
+    assert limit == HTTP_POOL_LIMIT
+    assert limit_per_host == max(HTTP_POOL_LIMIT_PER_HOST, BROADCAST_WORKERS)
@@ -0,0 +1,62 @@
+"""
+Постраничный вывод новостей: обход всех страниц по next_cursor.
+
+Новости, сохраненные в одну секунду, раньше возвращались на каждой странице
+заново (курсор по created_at не совпадал со строкой даты в SQLite).
+"""
+import os
+import re
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_news_pagination.db")
+
+import pytest
+
+from main import app, db, NewsItem
+
+NEWS_COUNT = 7
+
+@pytest.fixture(scope="module")
+def client():
+    with app.app_context():
+        NewsItem.query.delete()
+        # Одна транзакция - у всех новостей одинаковый created_at (func.now() с точностью до секунды)
+        for number in range(NEWS_COUNT):
+            db.session.add(NewsItem(title=f"Новость {number}", link=f"http://example.com/{number}",
+                                    source="test", summary="", pub_date=""))
+        db.session.commit()
+        expected_ids = [item.id for item in NewsItem.query.order_by(NewsItem.id.desc())]
+    client = app.test_client()
+    client.expected_ids = expected_ids
+    return client
+
+def test_api_news_pages_cover_every_item_once(client):
+    ids = []
+    url = "/api/news?limit=2"
+    for _ in range(NEWS_COUNT + 1):
+        data = client.get(url).get_json()
+        assert data["success"]
+        ids.extend(item["id"] for item in data["news"])
+        if data["next_cursor"] is None:
+            break
+        url = f"/api/news?limit=2&cursor={data['next_cursor']}"
+    else:
+        pytest.fail("next_cursor never became null")
+
+    assert len(ids) == len(set(ids))
+    assert ids == client.expected_ids
+
+def test_news_page_links_cover_every_item_once(client):
+    titles = []
+    url = "/news?limit=3"
+    for _ in range(NEWS_COUNT + 1):
+        html = client.get(url).get_data(as_text=True)
+        titles.extend(re.findall(r"Новость \d+", html))
+        next_link = re.search(r'href="(/news\?[^"]*cursor=[^"]+)"', html)
+        if next_link is None:
+            break
+        url = next_link.group(1).replace("&amp;", "&")
+    else:
+        pytest.fail("the news page kept linking to a next page")
+
+    assert len(titles) == len(set(titles)) == NEWS_COUNT
@@ -1,13 +1,22 @@
+import asyncio
+import aiohttp
 import feedparser
+import hashlib
+import json
 import logging
 import os
 import sys
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import time
 import re
 
-from config import RSS_FEEDS, NEWS_PER_FEED
+import http_client
+from keyword_matcher import KeywordMatcher
+from news_classifier import load_classifier, news_text
+from news_dedup import NewsDeduplicator
+from config import RSS_FEEDS, NEWS_PER_FEED, FEED_FETCH_CONCURRENCY, FEED_FETCH_TIMEOUT, TELEGRAM_MESSAGE_LIMIT, CLASSIFIER_MODEL_PATH
+from config import DEDUP_SIMILARITY, DEDUP_WINDOW_HOURS, DEDUP_INDEX_SIZE
 
 # Add the parent directory to path so we can import Flask models
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,16 +28,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Индекс недавних новостей для склейки одной истории из разных источников
+news_deduplicator = NewsDeduplicator(threshold=DEDUP_SIMILARITY,
+                                     max_age=DEDUP_WINDOW_HOURS * 3600,
+                                     max_size=DEDUP_INDEX_SIZE)
+
+# Add User-Agent to avoid blocks
+FEED_REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'}
+
 # Try to import Flask models
 try:
-    from main import app, FeedSource, BotSettings
+    from main import app, db, FeedSource, BotSettings
     use_db = True
     
-    def get_feed_urls() -> List[str]:
-        """Get feed URLs from the Flask database"""
+    def get_feed_states() -> List[Dict[str, Any]]:
+        """Get active feeds with their HTTP cache validators from the Flask database"""
         with app.app_context():
             feeds = FeedSource.query.filter_by(is_active=True).all()
-            return [feed.url for feed in feeds]
+            return [{
+                'url': feed.url,
+                'etag': feed.etag,
+                'last_modified': feed.last_modified,
+                'cached_entries': feed.cached_entries
+            } for feed in feeds]
+    
+    def save_feed_states(states: List[Dict[str, Any]]) -> None:
+        """Persist ETag / Last-Modified and parsed entries for the given feeds"""
+        with app.app_context():
+            feeds = FeedSource.query.filter(FeedSource.url.in_([s['url'] for s in states])).all()
+            feeds_by_url = {feed.url: feed for feed in feeds}
+            for state in states:
+                feed = feeds_by_url.get(state['url'])
+                if not feed:
+                    continue
+                feed.etag = state['etag']
+                feed.last_modified = state['last_modified']
+                feed.cached_entries = state['cached_entries']
+            db.session.commit()
             
     def get_news_limit() -> int:
         """Get number of news per source from settings"""
@@ -41,9 +77,17 @@ except ImportError:
     # If Flask app is not available, use config directly
     use_db = False
     
-    def get_feed_urls() -> List[str]:
-        """Get feed URLs from config"""
-        return RSS_FEEDS
+    # In-memory HTTP cache validators, lost on restart
+    _feed_states: Dict[str, Dict[str, Any]] = {}
+    
+    def get_feed_states() -> List[Dict[str, Any]]:
+        """Get feeds from config with their in-memory HTTP cache validators"""
+        return [_feed_states.get(url, {'url': url}) for url in RSS_FEEDS]
+    
+    def save_feed_states(states: List[Dict[str, Any]]) -> None:
+        """Remember ETag / Last-Modified and parsed entries in memory"""
+        for state in states:
+            _feed_states[state['url']] = state
         
     def get_news_limit() -> int:
         """Get number of news per source from config"""
@@ -65,13 +109,9 @@ def sanitize_html(text: str) -> str:
     
     return text
 
-def get_feed_entries(feed_url: str, max_entries: int = 3) -> List[Dict[str, Any]]:
-    """Get entries from a specific RSS feed including image preview if available"""
+def parse_feed_entries(feed: Any, feed_url: str, max_entries: int = 3) -> List[Dict[str, Any]]:
+    """Extract news entries from an already parsed feed including image preview if available"""
     try:
-        # Add User-Agent to avoid blocks
-        headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'}
-        feed = feedparser.parse(feed_url, request_headers=headers)
-        
         if not feed or not hasattr(feed, 'entries') or not feed.entries:
             logger.warning(f"No entries found in feed {feed_url}")
             return []
@@ -212,43 +252,162 @@ def get_feed_entries(feed_url: str, max_entries: int = 3) -> List[Dict[str, Any]
                 'pub_date': pub_date,
                 'summary': summary,
                 'source': source_name,
+                'feed_url': feed_url,
                 'image_url': image_url
             })
             
         return entries
         
     except Exception as e:
-        logger.error(f"Error fetching feed {feed_url}: {e}")
+        logger.error(f"Error parsing feed {feed_url}: {e}")
         return []
 
-def get_latest_news(max_per_feed: int = 3) -> Tuple[List[Dict[str, Any]], bool]:
-    """Get latest news from all configured RSS feeds"""
-    all_news = []
-    has_errors = False
+async def fetch_feed(session: aiohttp.ClientSession, feed_url: str, timeout: float = FEED_FETCH_TIMEOUT,
+                     etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Tuple[int, bytes, Dict[str, str]]]:
+    """
+    Download raw feed body
+    
+    When `etag` / `last_modified` are given the request is conditional and the
+    server may answer 304 with an empty body.
+    
+    Returns:
+        Tuple (status, body, lowercased headers) or None on failure
+    """
+    headers = dict(FEED_REQUEST_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    
+    try:
+        async with session.get(
+            feed_url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            response_headers = {k.lower(): v for k, v in response.headers.items()}
+            if response.status == 304:
+                return 304, b'', response_headers
+            if response.status != 200:
+                logger.warning(f"Feed {feed_url} returned HTTP {response.status}")
+                return None
+            body = await response.read()
+            return 200, body, response_headers
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout fetching feed {feed_url} after {timeout}s")
+        return None
+    except aiohttp.ClientError as e:
+        logger.error(f"Error fetching feed {feed_url}: {e}")
+        return None
+
+async def fetch_feed_entries(session: aiohttp.ClientSession, feed_state: Dict[str, Any], max_entries: int = 3,
+                             timeout: float = FEED_FETCH_TIMEOUT) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Download a feed and parse the fetched bytes in a worker thread
+    
+    Args:
+        feed_state: Dict from get_feed_states() with url, etag, last_modified and cached entries
+        
+    Returns:
+        Tuple containing:
+            - List of news entries
+            - New cache state for the feed or None if nothing has to be stored
+    """
+    feed_url = feed_state['url']
+    cached = feed_state.get('cached_entries') or {}
+    
+    # Conditional GET only makes sense if the cached entries can answer this request
+    can_revalidate = bool(cached.get('entries')) and cached.get('max_entries', 0) >= max_entries
+    fetched = await fetch_feed(
+        session, feed_url, timeout,
+        etag=feed_state.get('etag') if can_revalidate else None,
+        last_modified=feed_state.get('last_modified') if can_revalidate else None
+    )
+    if fetched is None:
+        return [], None
+    
+    status, body, headers = fetched
+    if status == 304:
+        logger.info(f"Feed {feed_url} not modified, using cached entries")
+        return cached['entries'][:max_entries], None
     
+    # Parsing is CPU bound, keep it off the event loop
+    response_headers = {'content-location': feed_url}
+    if 'content-type' in headers:
+        response_headers['content-type'] = headers['content-type']
+    feed = await asyncio.to_thread(feedparser.parse, body, response_headers=response_headers)
+    entries = parse_feed_entries(feed, feed_url, max_entries)
+    
+    etag = headers.get('etag')
+    last_modified = headers.get('last-modified')
+    new_state = {
+        'url': feed_url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'cached_entries': {'max_entries': max_entries, 'entries': entries} if (etag or last_modified) and entries else None
+    }
+    return entries, new_state
+
+async def get_latest_news_async(max_per_feed: int = 3,
+                                concurrency: int = FEED_FETCH_CONCURRENCY,
+                                timeout: float = FEED_FETCH_TIMEOUT) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Get latest news from all configured RSS feeds concurrently
+    
+    All feeds are downloaded at the same time over the shared HTTP pool, at most
+    `concurrency` requests in flight, each limited by `timeout` seconds.
+    Feeds that answer 304 Not Modified reuse their previously parsed entries.
+    The same story from several feeds is returned once per feed: the caller stores
+    all of them and collapses duplicates with news_deduplicator for display.
+    """
     try:
-        # Get feed URLs either from database or from config
-        feed_urls = get_feed_urls()
+        # Get feed URLs and cache validators either from database or from config
+        feed_states = await asyncio.to_thread(get_feed_states)
         
-        if not feed_urls:
+        if not feed_states:
             logger.warning("No feed URLs configured")
             return [], True
         
-        for feed_url in feed_urls:
-            entries = get_feed_entries(feed_url, max_per_feed)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        session = http_client.get_session()
+        
+        async def fetch_one(feed_state: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            async with semaphore:
+                return await fetch_feed_entries(session, feed_state, max_per_feed, timeout)
+        
+        results = await asyncio.gather(*(fetch_one(state) for state in feed_states))
+        
+        all_news = []
+        has_errors = False
+        updated_states = []
+        for entries, new_state in results:
             if not entries:
                 has_errors = True
+            if new_state is not None:
+                updated_states.append(new_state)
             all_news.extend(entries)
         
+        if updated_states:
+            await asyncio.to_thread(save_feed_states, updated_states)
+        
         # Sort by publication date (if available)
         all_news.sort(key=lambda x: x.get('pub_date', ''), reverse=True)
         
+        # Рубрики определяются один раз при загрузке и дальше хранятся в самих новостях
+        for item, category in zip(all_news, news_categories(all_news)):
+            item['category'] = category
+        
         return all_news, has_errors
         
     except Exception as e:
         logger.error(f"Error getting latest news: {e}")
         return [], True
 
+def get_latest_news(max_per_feed: int = 3) -> Tuple[List[Dict[str, Any]], bool]:
+    """Get latest news from all configured RSS feeds (blocking wrapper for sync callers)"""
+    return http_client.run_sync(get_latest_news_async(max_per_feed))
+
 def format_news_message(news_items: List[Dict[str, Any]], with_images: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
     """
     Format news items into a Telegram message
@@ -319,6 +478,12 @@ def format_news_message(news_items: List[Dict[str, Any]], with_images: bool = Fa
                 f"{summary}\n"
                 f"🔗 <a href='{link}'>Читать полностью</a>"
             )
+            if item.get('also_in'):
+                other_sources = ", ".join(
+                    f"<a href='{other['link']}'>{(other['source'] or 'источник').replace('<', '&lt;').replace('>', '&gt;')}</a>"
+                    for other in item['also_in']
+                )
+                news_item += f"\n↪️ Также в: {other_sources}"
             all_parts.append(news_item)
             
             # Добавляем в список новостей с изображениями, если есть изображение
@@ -340,6 +505,151 @@ def format_news_message(news_items: List[Dict[str, Any]], with_images: bool = Fa
     
     return "\n\n".join(all_parts), news_with_images
 
+HTML_TAG_RE = re.compile(r'<(/?)([a-zA-Z]+)[^>]*>')
+
+def _hard_slices(text: str, limit: int) -> List[str]:
+    """Cut text without tags into pieces of at most limit characters, not inside an &entity;"""
+    pieces = []
+    while len(text) > limit:
+        cut = limit
+        ampersand = text.rfind('&', 0, cut)
+        if ampersand > 0 and text.find(';', ampersand, cut) == -1:
+            cut = ampersand
+        pieces.append(text[:cut])
+        text = text[cut:]
+    pieces.append(text)
+    return pieces
+
+def _line_units(line: str, limit: int) -> List[Tuple[str, str]]:
+    """
+    Split an over-long line into (separator, piece) pairs
+    
+    The line is cut only at spaces outside HTML elements, so every piece keeps
+    its tags balanced. Only text without tags is sliced at fixed offsets; an
+    element that alone exceeds the limit loses its markup.
+    """
+    words = []
+    current = ""
+    depth = 0
+    for token in re.findall(r'<[^>]*>|[^<]+', line):
+        if token.startswith('<'):
+            current += token
+            tag = HTML_TAG_RE.match(token)
+            if tag and not token.endswith('/>'):
+                depth = max(0, depth - 1) if tag.group(1) else depth + 1
+            continue
+        if depth:
+            current += token
+            continue
+        parts = token.split(' ')
+        current += parts[0]
+        for part in parts[1:]:
+            words.append(current)
+            current = part
+    words.append(current)
+    
+    units = []
+    for word in words:
+        if len(word) <= limit:
+            units.append((' ', word))
+            continue
+        for index, piece in enumerate(_hard_slices(HTML_TAG_RE.sub('', word), limit)):
+            units.append((' ' if index == 0 else '', piece))
+    return units
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split a long message into chunks that fit into one Telegram message
+    
+    Text is cut on paragraph boundaries ("\n\n") so HTML tags of a news item
+    are never split; a single paragraph longer than the limit is cut on lines,
+    and a line longer than the limit - on spaces outside HTML elements.
+    """
+    units = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= limit:
+            units.append(("\n\n", paragraph))
+            continue
+        for index, line in enumerate(paragraph.split("\n")):
+            separator = "\n\n" if index == 0 else "\n"
+            if len(line) <= limit:
+                units.append((separator, line))
+                continue
+            line_units = _line_units(line, limit)
+            units.append((separator, line_units[0][1]))
+            units.extend(line_units[1:])
+    
+    chunks = []
+    current = ""
+    for separator, unit in units:
+        candidate = f"{current}{separator}{unit}" if current else unit
+        if len(candidate) <= limit:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+def digest_content_hash(payload: Dict[str, Any]) -> str:
+    """Stable SHA-256 of a digest payload"""
+    serialized = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+def link_hash(link: str) -> str:
+    """Short stable hash of a news link (64 bits, 16 hex characters)"""
+    return hashlib.blake2b(link.encode('utf-8'), digest_size=8).hexdigest()
+
+def news_link_hashes(news_item: Dict[str, Any]) -> List[str]:
+    """Hashes of the item link and of the links to the same story in other feeds (also_in)"""
+    links = [news_item.get('link')] + [other.get('link') for other in news_item.get('also_in', ())]
+    return [link_hash(link) for link in links if link]
+
+# Keywords for each news category (lowercase word stems); "Другое" collects the rest
+CATEGORY_KEYWORDS = {
+    "Общество": ["общество", "люди", "социальн", "образовани", "культур", "традиц", "историч", "население"],
+    "Экономика": ["экономик", "финанс", "инвестиц", "банк", "рубл", "доллар", "бизнес", "кризис", "инфляц", "цен"],
+    "Политика": ["политик", "президент", "выбор", "парламент", "госдум", "правительств", "депутат", "санкц"],
+    "Происшествия": ["авари", "катастроф", "происшеств", "пожар", "дтп", "чрезвычайн", "несчастн", "преступ"],
+    "Спорт": ["спорт", "футбол", "хоккей", "баскетбол", "олимпи", "чемпионат", "кубок", "турнир", "матч"],
+    "Технологии": ["технолог", "гаджет", "компьютер", "интернет", "программ", "мобильн", "телефон", "робот", "искусствен"],
+    "Развлечения": ["кино", "фильм", "сериал", "музык", "звезд", "концерт", "театр", "выставк", "игр"]
+}
+DEFAULT_CATEGORY = "Другое"
+
+# Автомат ключевых слов строится один раз при импорте (таблица задается только в коде)
+keyword_matcher = KeywordMatcher(CATEGORY_KEYWORDS)
+
+def keyword_categories(news_items: List[Any]) -> List[str]:
+    """Categories of news items by keywords in their title and summary"""
+    return [keyword_matcher.categorize(news_text(item).lower()) or DEFAULT_CATEGORY for item in news_items]
+
+def categorize_news_item(item: Dict[str, Any]) -> str:
+    """Category of a single news item by keywords in its title and summary"""
+    return keyword_categories([item])[0]
+
+def classify_news_items(news_items: List[Dict[str, Any]]) -> List[str]:
+    """
+    Categories for a batch of news items
+    
+    Uses the trained batch classifier (one matrix product for the whole batch)
+    when its model file exists, and the keyword rules otherwise.
+    """
+    classifier = load_classifier(CLASSIFIER_MODEL_PATH)
+    if classifier is not None:
+        return classifier.predict([news_text(item) for item in news_items])
+    return keyword_categories(news_items)
+
+def news_categories(news_items: List[Dict[str, Any]]) -> List[str]:
+    """Categories of news items: the stored 'category' when present, the rest classified in one batch"""
+    categories = [item.get('category') for item in news_items]
+    missing = [index for index, category in enumerate(categories) if not category]
+    if missing:
+        for index, category in zip(missing, classify_news_items([news_items[index] for index in missing])):
+            categories[index] = category
+    return categories
+
 def get_categorized_news(news_items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """
     Categorize news items by topics
@@ -350,46 +660,11 @@ def get_categorized_news(news_items: List[Dict[str, Any]]) -> Dict[str, List[Dic
     Returns:
         Dictionary with categories as keys and lists of news items as values
     """
-    categories = {
-        "Общество": [],
-        "Экономика": [],
-        "Политика": [],
-        "Происшествия": [],
-        "Спорт": [],
-        "Технологии": [],
-        "Развлечения": [],
-        "Другое": []
-    }
-    
-    # Keywords for each category
-    keywords = {
-        "Общество": ["общество", "люди", "социальн", "образовани", "культур", "традиц", "историч", "население"],
-        "Экономика": ["экономик", "финанс", "инвестиц", "банк", "рубл", "доллар", "бизнес", "кризис", "инфляц", "цен"],
-        "Политика": ["политик", "президент", "выбор", "парламент", "госдум", "правительств", "депутат", "санкц"],
-        "Происшествия": ["авари", "катастроф", "происшеств", "пожар", "дтп", "чрезвычайн", "несчастн", "преступ"],
-        "Спорт": ["спорт", "футбол", "хоккей", "баскетбол", "олимпи", "чемпионат", "кубок", "турнир", "матч"],
-        "Технологии": ["технолог", "гаджет", "компьютер", "интернет", "программ", "мобильн", "телефон", "робот", "искусствен"],
-        "Развлечения": ["кино", "фильм", "сериал", "музык", "звезд", "концерт", "театр", "выставк", "игр"]
-    }
+    categories = {category: [] for category in CATEGORY_KEYWORDS}
+    categories[DEFAULT_CATEGORY] = []
     
-    for item in news_items:
-        title = item.get('title', '').lower()
-        summary = item.get('summary', '').lower()
-        text = title + " " + summary
-        
-        # Default category
-        category = "Другое"
-        max_matches = 0
-        
-        # Check each category
-        for cat, words in keywords.items():
-            matches = sum(1 for word in words if word in text)
-            if matches > max_matches:
-                max_matches = matches
-                category = cat
-        
-        # Add to matching category
-        categories[category].append(item)
+    for item, category in zip(news_items, news_categories(news_items)):
+        categories.setdefault(category, []).append(item)
     
     # Remove empty categories
     return {k: v for k, v in categories.items() if v}